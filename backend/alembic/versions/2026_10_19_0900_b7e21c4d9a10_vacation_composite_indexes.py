@@ -0,0 +1,45 @@
+"""add composite indexes for vacation_requests date-range queries
+
+Los filtros por año usan ahora rangos sobre start_date
+(start_date >= 1 ene AND start_date < 1 ene siguiente), que pueden usar índices:
+  - (company, status, start_date): listados, estadísticas y pendientes por empresa
+  - (user_id, start_date): uso anual y solicitudes de un trabajador
+
+Revision ID: b7e21c4d9a10
+Revises: 2025_10_03_0000_squashed_initial_baseline
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e21c4d9a10'
+down_revision: Union[str, None] = '2025_10_03_0000_squashed_initial_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_vacation_requests_company_status_start",
+        "vacation_requests",
+        ["company", "status", "start_date"],
+        unique=False,
+        if_not_exists=True,
+    )
+    op.create_index(
+        "idx_vacation_requests_user_start",
+        "vacation_requests",
+        ["user_id", "start_date"],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_vacation_requests_user_start", table_name="vacation_requests", if_exists=True)
+    op.drop_index("idx_vacation_requests_company_status_start", table_name="vacation_requests", if_exists=True)
@@ -0,0 +1,93 @@
+"""add daterange period with GiST index and overlap exclusion to vacation_requests
+
+Solo PostgreSQL (en SQLite no hace nada: la aplicación usa la consulta de rango).
+  - Columna generada `period` = daterange(start_date, end_date, '[]')
+  - Índice GiST (user_id, period) para la detección de solapes con &&
+  - Restricción de exclusión: un usuario no puede tener dos ausencias APROBADAS
+    solapadas. Si los datos existentes ya contienen solapes la migración falla
+    (se deshace entera) e indica los pares; hay que corregirlos y volver a ejecutarla.
+
+Revision ID: c4f8a2e61d37
+Revises: b7e21c4d9a10
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8a2e61d37'
+down_revision: Union[str, None] = 'b7e21c4d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Pares mostrados en el error cuando hay solapes previos
+MAX_REPORTED_CONFLICTS = 20
+
+CONSTRAINT_NAME = "excl_vacation_requests_approved_overlap"
+INDEX_NAME = "idx_vacation_requests_user_period"
+
+
+def _date_expr(bind, column: str) -> str:
+    """Conversión inmutable a fecha (requisito de las columnas generadas)."""
+    data_type = bind.execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = 'vacation_requests' AND column_name = :column"
+    ), {"column": column}).scalar()
+    if data_type == "timestamp with time zone":
+        # timestamptz::date depende de la zona de la sesión; fijar UTC
+        return f"(({column} AT TIME ZONE 'UTC')::date)"
+    return f"({column}::date)"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    # btree_gist permite combinar user_id (igualdad) y period (&&) en el mismo índice GiST
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+    start_expr = _date_expr(bind, "start_date")
+    end_expr = _date_expr(bind, "end_date")
+    op.execute(
+        "ALTER TABLE vacation_requests ADD COLUMN IF NOT EXISTS period daterange "
+        f"GENERATED ALWAYS AS (daterange({start_expr}, {end_expr}, '[]')) STORED"
+    )
+    op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON vacation_requests USING gist (user_id, period)")
+
+    conflicts = bind.execute(sa.text(
+        "SELECT a.user_id, a.id, b.id FROM vacation_requests a JOIN vacation_requests b "
+        "ON a.user_id = b.user_id AND a.id < b.id AND a.period && b.period "
+        "WHERE upper(a.status::text) = 'APPROVED' AND upper(b.status::text) = 'APPROVED' "
+        "ORDER BY a.user_id, a.id, b.id"
+    )).all()
+    if conflicts:
+        # Sin la restricción la comprobación de la aplicación sería la única garantía:
+        # no se continúa hasta que los datos estén limpios
+        pairs = ", ".join(
+            f"usuario {user_id}: {first_id}/{second_id}"
+            for user_id, first_id, second_id in conflicts[:MAX_REPORTED_CONFLICTS]
+        )
+        raise RuntimeError(
+            f"{len(conflicts)} pares de ausencias aprobadas solapadas impiden crear {CONSTRAINT_NAME} "
+            f"({pairs}). Corrígelos (rechaza o ajusta una de cada par) y ejecuta de nuevo la migración."
+        )
+
+    op.execute(
+        f"ALTER TABLE vacation_requests ADD CONSTRAINT {CONSTRAINT_NAME} "
+        "EXCLUDE USING gist (user_id WITH =, period WITH &&) "
+        "WHERE (upper(status::text) = 'APPROVED')"
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    op.execute(f"ALTER TABLE vacation_requests DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}")
+    op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+    op.execute("ALTER TABLE vacation_requests DROP COLUMN IF EXISTS period")
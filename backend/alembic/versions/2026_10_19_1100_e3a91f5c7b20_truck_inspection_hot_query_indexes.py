@@ -0,0 +1,77 @@
+"""add partial, composite and trigram indexes for truck_inspections; backfill company
+
+  - Rellena company en las inspecciones legacy (company IS NULL) con la empresa del
+    trabajador, de modo que los listados filtran solo por truck_inspections.company
+    (sin el OR con la subconsulta correlacionada sobre users).
+  - Índice parcial (company, inspection_date DESC) WHERE has_issues AND NOT is_reviewed:
+    incidencias pendientes de revisar (pending-issues, resumen de avisos).
+  - Índice (user_id, inspection_date DESC): última inspección de cada conductor (check-needed).
+  - Solo PostgreSQL: índice GIN con pg_trgm sobre truck_license_plate para ILIKE '%x%'.
+
+Revision ID: e3a91f5c7b20
+Revises: c4f8a2e61d37
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a91f5c7b20'
+down_revision: Union[str, None] = 'c4f8a2e61d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNREVIEWED_INDEX = "idx_truck_inspections_unreviewed_issues"
+USER_DATE_INDEX = "idx_truck_inspections_user_date"
+PLATE_TRGM_INDEX = "idx_truck_inspections_plate_trgm"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Backfill de empresa: la empresa actual del trabajador que hizo la inspección
+    op.execute(
+        "UPDATE truck_inspections SET company = ("
+        "    SELECT users.company FROM users WHERE users.id = truck_inspections.user_id"
+        ") "
+        "WHERE company IS NULL AND EXISTS ("
+        "    SELECT 1 FROM users WHERE users.id = truck_inspections.user_id AND users.company IS NOT NULL"
+        ")"
+    )
+
+    op.create_index(
+        UNREVIEWED_INDEX,
+        "truck_inspections",
+        ["company", sa.text("inspection_date DESC")],
+        unique=False,
+        postgresql_where=sa.text("has_issues AND NOT is_reviewed"),
+        sqlite_where=sa.text("has_issues AND NOT is_reviewed"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        USER_DATE_INDEX,
+        "truck_inspections",
+        ["user_id", sa.text("inspection_date DESC")],
+        unique=False,
+        if_not_exists=True,
+    )
+
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {PLATE_TRGM_INDEX} "
+            "ON truck_inspections USING gin (truck_license_plate gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {PLATE_TRGM_INDEX}")
+    op.drop_index(USER_DATE_INDEX, table_name="truck_inspections", if_exists=True)
+    op.drop_index(UNREVIEWED_INDEX, table_name="truck_inspections", if_exists=True)
+    # El backfill de company no se revierte: los valores rellenados son correctos
@@ -0,0 +1,47 @@
+"""add keyset pagination index on direct_inspection_orders
+
+  - Índice (company, created_at DESC, id DESC): listado de órdenes directas por
+    empresa con paginación por cursor sobre (created_at, id).
+  - Índice (created_at DESC, id DESC): mismo listado sin filtro de empresa (MASTER_ADMIN).
+
+Revision ID: f5b2d8c31a64
+Revises: e3a91f5c7b20
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b2d8c31a64'
+down_revision: Union[str, None] = 'e3a91f5c7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COMPANY_KEYSET_INDEX = "idx_direct_inspection_orders_company_created_id"
+KEYSET_INDEX = "idx_direct_inspection_orders_created_id"
+
+
+def upgrade() -> None:
+    op.create_index(
+        COMPANY_KEYSET_INDEX,
+        "direct_inspection_orders",
+        ["company", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+        if_not_exists=True,
+    )
+    op.create_index(
+        KEYSET_INDEX,
+        "direct_inspection_orders",
+        [sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(KEYSET_INDEX, table_name="direct_inspection_orders", if_exists=True)
+    op.drop_index(COMPANY_KEYSET_INDEX, table_name="direct_inspection_orders", if_exists=True)
@@ -1,20 +1,21 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, status, Header
 from fastapi.responses import JSONResponse
 from app.models.schemas import DashboardStats
-from app.services.payroll_pdf_service import PayrollPDFProcessor
 from sqlalchemy.orm import Session
 from app.database.connection import get_db
 from app.models.user import User, UserRole, UserStatus
 from app.models.vacation import VacationRequest, VacationStatus
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from app.config import settings
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import heapq
 import tempfile
 import os
 from app.api.auth import get_current_user
 from app.utils.company_context import effective_company_for_request
 from typing import Any, cast
 from app.utils.permissions import require_role
+from app.services.vacation_cache import availability_cache, available_workers_cache, cache_key
 
 router = APIRouter()
 
@@ -52,6 +53,8 @@ async def get_available_workers(
 ):
     """Devuelve trabajadores disponibles el día indicado (o hoy) con filtro opcional por *position*.
 
+    Se cachea unos segundos por (empresa, fecha) y se invalida al cambiar cualquier solicitud.
+
     Respuesta extendida para soportar selector de puestos (positions):
     {
       "date": "YYYY-MM-DD",
@@ -59,10 +62,8 @@ async def get_available_workers(
       "positions": ["Conductor", "Carretillero", ...]
     }
     """
-    from datetime import datetime, date as date_cls
-
     # Resolver fecha (si no viene -> hoy en zona UTC naive)
-    day: date_cls
+    day: date
     if target_date:
         try:
             day = datetime.strptime(target_date, "%Y-%m-%d").date()
@@ -75,53 +76,48 @@ async def get_available_workers(
     # Scoping por empresa
     comp = effective_company_for_request(current_user, x_company)
 
-    # IDs de usuarios de vacaciones ese día (acotado por empresa cuando aplique)
-    vac_query = db.query(VacationRequest.user_id).filter(
-        VacationRequest.status == VacationStatus.APPROVED,
-        VacationRequest.start_date <= day,
-        VacationRequest.end_date >= day,
-    )
-    if comp is not None:
-        # Unir con User para filtrar por empresa del usuario
-        vac_query = vac_query.join(User, User.id == VacationRequest.user_id).filter(User.company == comp)
-    vacation_user_ids = [uid for (uid,) in vac_query.all()]
+    key = cache_key(comp, target_date)
+    cached = available_workers_cache.get(key)
+    if cached is not None:
+        return cached
 
+    # Anti-join NOT EXISTS: el usuario no tiene vacaciones aprobadas que cubran el día
+    # (correlacionado con User, usa el índice (user_id, start_date) de vacation_requests)
+    on_vacation = (
+        db.query(VacationRequest.id)
+        .filter(
+            VacationRequest.user_id == User.id,
+            VacationRequest.status == VacationStatus.APPROVED,
+            VacationRequest.start_date <= day,
+            VacationRequest.end_date >= day,
+        )
+        .exists()
+    )
     base_query = db.query(User).filter(
         User.role == UserRole.TRABAJADOR,
         cast(Any, User.status == UserStatus.ACTIVO),  # Solo usuarios ACTIVOS (no BAJA ni INACTIVO)
+        ~on_vacation,
     )
     if comp is not None:
         base_query = base_query.filter(User.company == comp)
-    if vacation_user_ids:
-        base_query = base_query.filter(User.id.notin_(vacation_user_ids))
 
-    # Obtener lista de posiciones únicas (sin None) para poblar el selector
-    # (se obtiene antes de aplicar filtro especifico para que el usuario vea todas las opciones)
-    # Obtener posiciones (todas las de trabajadores activos, independientemente de vacaciones o filtro position)
-    pos_query = db.query(User.position).filter(
+    # Posiciones únicas (todas las de trabajadores activos, independientemente de vacaciones)
+    # normalizadas con TRIM + DISTINCT en la base de datos; solo se ordenan en Python
+    trimmed_position = func.trim(User.position)
+    pos_query = db.query(trimmed_position).filter(
         User.role == UserRole.TRABAJADOR,
         cast(Any, User.status == UserStatus.ACTIVO),  # Solo usuarios ACTIVOS para posiciones
         User.position.isnot(None),
-        User.position != ''
+        trimmed_position != '',
     )
     if comp is not None:
         pos_query = pos_query.filter(User.company == comp)
-    raw_positions = pos_query.all()
-    # Normalizar en Python para evitar issues de DISTINCT + ORDER BY en algunos motores
-    norm_positions_set = {}
-    for (pos,) in raw_positions:
-        if pos is None:
-            continue
-        key = pos.strip()
-        if not key:
-            continue
-        norm_positions_set[key] = True
-    distinct_positions = sorted(norm_positions_set.keys(), key=lambda x: x.lower())
+    distinct_positions = sorted((pos for (pos,) in pos_query.distinct().all()), key=lambda x: x.lower())
 
     # El filtro por "position" ha sido eliminado del dashboard; siempre devolvemos todos los disponibles
     workers = base_query.order_by(User.last_name.asc(), User.first_name.asc()).all()
 
-    return {
+    result = {
         "date": target_date,
         "available": [
             {"id": u.id, "full_name": u.full_name, "dni_nie": u.dni_nie, "position": u.position}
@@ -129,6 +125,131 @@ async def get_available_workers(
         ],
         "positions": distinct_positions,
     }
+    available_workers_cache.set(key, result)
+    return result
+
+AVAILABILITY_MAX_DAYS = 92
+NO_POSITION_LABEL = "Sin puesto"
+
+
+@router.get("/availability")
+async def get_availability(
+    from_date: str = Query(..., alias="from", description="Primer día YYYY-MM-DD"),
+    to_date: str = Query(..., alias="to", description="Último día YYYY-MM-DD (incluido)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    x_company: str | None = Header(default=None, alias="X-Company"),
+):
+    """Calendario de disponibilidad de trabajadores para un rango de días.
+
+    Carga una sola vez las vacaciones aprobadas que solapan el rango y recorre los
+    días con un barrido sobre los intervalos ordenados. Para cada día devuelve los
+    ids disponibles y ausentes y el número de disponibles por puesto:
+    {
+      "from": "YYYY-MM-DD", "to": "YYYY-MM-DD",
+      "workers": [{id, full_name, position}],
+      "positions": ["Conductor", ...],
+      "days": [{date, available_ids, absent_ids, available_count, absent_count, available_by_position}]
+    }
+    Se cachea por (empresa, rango) y se invalida al cambiar cualquier solicitud.
+    """
+    try:
+        start_day = datetime.strptime(from_date, "%Y-%m-%d").date()
+        end_day = datetime.strptime(to_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Use YYYY-MM-DD")
+    if end_day < start_day:
+        raise HTTPException(status_code=400, detail="'to' no puede ser anterior a 'from'")
+    total_days = (end_day - start_day).days + 1
+    if total_days > AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango máximo es de {AVAILABILITY_MAX_DAYS} días")
+
+    comp = effective_company_for_request(current_user, x_company)
+    key = cache_key(comp, start_day.isoformat(), end_day.isoformat())
+    cached = availability_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Trabajadores activos (mismo criterio que available-workers)
+    worker_query = db.query(User.id, User.first_name, User.last_name, User.position).filter(
+        User.role == UserRole.TRABAJADOR,
+        cast(Any, User.status == UserStatus.ACTIVO),
+    )
+    if comp is not None:
+        worker_query = worker_query.filter(User.company == comp)
+    workers = sorted(worker_query.all(), key=lambda w: ((w.last_name or "").lower(), (w.first_name or "").lower()))
+    position_of = {w.id: ((w.position or "").strip() or NO_POSITION_LABEL) for w in workers}
+    total_by_position: dict[str, int] = {}
+    for position in position_of.values():
+        total_by_position[position] = total_by_position.get(position, 0) + 1
+
+    # Vacaciones aprobadas que solapan el rango, ordenadas por inicio
+    range_start = datetime.combine(start_day, datetime.min.time())
+    range_end = datetime.combine(end_day, datetime.max.time())
+    vac_query = db.query(VacationRequest.user_id, VacationRequest.start_date, VacationRequest.end_date).filter(
+        VacationRequest.status == VacationStatus.APPROVED,
+        VacationRequest.start_date <= range_end,
+        VacationRequest.end_date >= range_start,
+    )
+    if comp is not None:
+        vac_query = vac_query.join(User, User.id == VacationRequest.user_id).filter(User.company == comp)
+    intervals = sorted(
+        (max(sd.date(), start_day), min(ed.date(), end_day), uid)
+        for uid, sd, ed in vac_query.all()
+        if uid in position_of
+    )
+
+    # Barrido: se añaden intervalos al llegar su inicio y se retiran al pasar su fin.
+    # absent_count por usuario soporta intervalos solapados del mismo trabajador.
+    days = []
+    next_interval = 0
+    active_ends: list[tuple[date, int]] = []
+    absent_count: dict[int, int] = {}
+    absent_by_position: dict[str, int] = {}
+    all_ids = [w.id for w in workers]
+    for offset in range(total_days):
+        day = start_day + timedelta(days=offset)
+        while next_interval < len(intervals) and intervals[next_interval][0] <= day:
+            _, interval_end, uid = intervals[next_interval]
+            heapq.heappush(active_ends, (interval_end, uid))
+            if absent_count.get(uid, 0) == 0:
+                absent_by_position[position_of[uid]] = absent_by_position.get(position_of[uid], 0) + 1
+            absent_count[uid] = absent_count.get(uid, 0) + 1
+            next_interval += 1
+        while active_ends and active_ends[0][0] < day:
+            _, uid = heapq.heappop(active_ends)
+            absent_count[uid] -= 1
+            if absent_count[uid] == 0:
+                del absent_count[uid]
+                absent_by_position[position_of[uid]] -= 1
+
+        absent_ids = [uid for uid in all_ids if uid in absent_count]
+        available_ids = [uid for uid in all_ids if uid not in absent_count]
+        days.append({
+            "date": day.isoformat(),
+            "available_ids": available_ids,
+            "absent_ids": absent_ids,
+            "available_count": len(available_ids),
+            "absent_count": len(absent_ids),
+            "available_by_position": {
+                position: total - absent_by_position.get(position, 0)
+                for position, total in total_by_position.items()
+            },
+        })
+
+    result = {
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "workers": [
+            {"id": w.id, "full_name": f"{w.first_name} {w.last_name}".strip(), "position": w.position}
+            for w in workers
+        ],
+        "positions": sorted(total_by_position.keys(), key=lambda x: x.lower()),
+        "days": days,
+    }
+    availability_cache.set(key, result)
+    return result
+
 
 @router.post("/process-payroll-pdf")
 @require_role(UserRole.ADMINISTRADOR, UserRole.MASTER_ADMIN)
@@ -173,6 +294,8 @@ async def process_payroll_pdf_upload(
             temp_file_path = temp_file.name
         
         # Inicializar el procesador de PDFs
+        # Import perezoso: PyMuPDF solo se carga cuando se procesa un PDF
+        from app.services.payroll_pdf_service import PayrollPDFProcessor
         processor = PayrollPDFProcessor(settings.user_files_base_path)
         
         # Procesar el PDF
@@ -233,6 +356,8 @@ async def get_payroll_folders_status(current_user: User = Depends(get_current_us
     # require_role ya valida el rol
     
     try:
+        # Import perezoso: PyMuPDF solo se carga cuando se procesa un PDF
+        from app.services.payroll_pdf_service import PayrollPDFProcessor
         processor = PayrollPDFProcessor(settings.user_files_base_path)
         user_files_path = settings.user_files_base_path
         
@@ -292,6 +417,8 @@ async def debug_pdf_text_extraction(
             temp_file_path = temp_file.name
         
         # Inicializar procesador y hacer debug
+        # Import perezoso: PyMuPDF solo se carga cuando se procesa un PDF
+        from app.services.payroll_pdf_service import PayrollPDFProcessor
         processor = PayrollPDFProcessor(settings.user_files_base_path)
         debug_info = processor.debug_text_extraction(temp_file_path, page_number)
         
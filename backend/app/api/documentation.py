@@ -1,5 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Query
 from sqlalchemy.orm import Session
 from typing import List
 import mimetypes
@@ -12,6 +11,8 @@ from app.api.auth import get_current_user, oauth2_scheme
 from app.models.user import User
 from app.utils.company_context import effective_company_for_request
 from app.models.company_enum import Company
+from app.utils.file_delivery import serve_file
+from app.services.pdf_thumbnail_service import serve_pdf_thumbnail
 
 router = APIRouter()
 
@@ -214,6 +215,7 @@ async def download_document(
     user_dni: str,
     folder: str,
     filename: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     x_company: str | None = Header(default=None, alias="X-Company"),
@@ -255,11 +257,7 @@ async def download_document(
             content_type = 'application/octet-stream'
         
         # Retornar el archivo
-        return FileResponse(
-            path=str(file_path),
-            filename=filename,
-            media_type=content_type
-        )
+        return serve_file(request, resolved_path, filename=filename, media_type=content_type)
         
     except HTTPException:
         raise
@@ -272,12 +270,15 @@ async def preview_document(
     user_dni: str,
     folder: str,
     filename: str,
+    request: Request,
     token: str | None = None,
+    thumbnail: bool = Query(False, description="Devolver solo la miniatura de la primera página"),
     db: Session = Depends(get_db),
 ):
     """
     Previsualiza un documento (especialmente PDFs) en el navegador
     Soporta autenticación por query parameter token (compatible con iframes)
+    Con thumbnail=true devuelve una imagen pequeña de la primera página (solo PDFs)
     """
     try:
         # Validar token JWT del query parameter (obligatorio para este endpoint)
@@ -324,6 +325,11 @@ async def preview_document(
         if not str(resolved_path).startswith(str(allowed_path)):
             raise HTTPException(status_code=403, detail="Acceso denegado")
         
+        if thumbnail:
+            if not filename.lower().endswith('.pdf'):
+                raise HTTPException(status_code=400, detail="Solo hay miniaturas de archivos PDF")
+            return await serve_pdf_thumbnail(request, resolved_path)
+        
         # Obtener el tipo MIME del archivo
         content_type, _ = mimetypes.guess_type(str(file_path))
         if content_type is None:
@@ -334,13 +340,7 @@ async def preview_document(
             content_type = 'application/pdf'
         
         # Retornar el archivo para visualización en navegador (sin forzar descarga)
-        return FileResponse(
-            path=str(file_path),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": "inline"
-            }
-        )
+        return serve_file(request, resolved_path, media_type=content_type, disposition="inline")
         
     except HTTPException:
         raise
@@ -1,5 +1,4 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Query, BackgroundTasks
 from app.models.schemas import Document
 from datetime import datetime
 from typing import List, Optional
@@ -10,6 +9,8 @@ from pathlib import Path
 from app.api.auth import get_current_user
 from app.models.user import User
 from app.config import settings
+from app.utils.file_delivery import serve_file
+from app.services.pdf_thumbnail_service import PdfThumbnailService, serve_pdf_thumbnail
 
 router = APIRouter()
 
@@ -86,7 +87,7 @@ async def get_document_stats(current_user: User = Depends(get_current_user)):
     }
 
 @router.post("/upload-general-documents")
-async def upload_general_documents(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+async def upload_general_documents(background_tasks: BackgroundTasks, file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
     """
     Endpoint para subir documentos generales que estarán disponibles para todos los trabajadores.
     Estos documentos se almacenan en la carpeta 'documentos' y son visibles por todos.
@@ -121,6 +122,9 @@ async def upload_general_documents(file: UploadFile = File(...), current_user: U
         with open(file_path, "wb") as buffer:
             buffer.write(content)
         
+        # Precalcular la miniatura para el listado
+        background_tasks.add_task(PdfThumbnailService.warm_up, file_path)
+        
         # Crear registro del documento
         new_document = Document(
             id=len(documents) + 1,
@@ -151,26 +155,28 @@ async def upload_general_documents(file: UploadFile = File(...), current_user: U
         raise HTTPException(status_code=500, detail=f"Error al subir el documento: {str(e)}")
 
 @router.get("/download/general/{filename}")
-async def download_general_document(filename: str, current_user: User = Depends(get_current_user)):
+async def download_general_document(filename: str, request: Request, current_user: User = Depends(get_current_user)):
     """
     Endpoint para descargar documentos generales.
     """
     file_path = Path(settings.documents_files_base_path) / filename
     
-    if not file_path.exists():
+    if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type='application/pdf'
-    )
+    return serve_file(request, file_path, filename=filename, media_type='application/pdf')
 
 @router.get("/preview/general/{filename}")
-async def preview_general_document(filename: str, token: Optional[str] = None):
+async def preview_general_document(
+    filename: str,
+    request: Request,
+    token: Optional[str] = None,
+    thumbnail: bool = Query(False, description="Devolver solo la miniatura de la primera página"),
+):
     """
     Endpoint para previsualizar documentos generales en iframe.
     Usa autenticación por token en query parameter para funcionar con iframes.
+    Con thumbnail=true devuelve una imagen pequeña de la primera página.
     """
     from app.api.auth import get_current_user
     from app.database.connection import get_db
@@ -212,12 +218,10 @@ async def preview_general_document(filename: str, token: Optional[str] = None):
     if not filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Solo se pueden previsualizar archivos PDF")
     
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type='application/pdf',
-        headers={"Content-Disposition": "inline"}
-    )
+    if thumbnail:
+        return await serve_pdf_thumbnail(request, file_path)
+    
+    return serve_file(request, file_path, media_type='application/pdf', disposition="inline")
 
 @router.delete("/admin/delete/general/{filename}")
 async def delete_general_document(filename: str, current_user: User = Depends(get_current_user)):
@@ -0,0 +1,150 @@
+"""
+Stream de eventos en tiempo real (Server-Sent Events).
+
+Una única conexión por pestaña sustituye a los sondeos periódicos: el servidor
+envía los eventos publicados en EventBus que corresponden a la empresa, el rol y
+el usuario de la sesión. EventSource no permite cabeceras propias, por lo que el
+token y la empresa pueden enviarse también como parámetros de la URL.
+
+La sesión se vuelve a validar en cada latido (caducidad del token, estado, rol y
+empresa del usuario en la base de datos); si ya no es válida se envía
+"session.ended" y se cierra el stream.
+"""
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from jose import JWTError, jwt
+
+from app.api.auth import get_current_user
+from app.config import settings
+from app.database.connection import SessionLocal
+from app.services.user_service import UserService
+from app.services.event_bus import EventBus, EventSubscriber
+from app.utils.company_context import effective_company_for_request
+
+router = APIRouter()
+
+# Tiempo que espera el navegador antes de reconectar tras un corte (ms)
+RECONNECT_DELAY_MS = 5000
+
+
+def _format_event(event_type: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _session_is_valid(token: str, company_hint: Optional[str], subscriber: EventSubscriber) -> bool:
+    """
+    True si el token sigue vigente y el usuario puede iniciar sesión con el mismo
+    rol y la misma empresa efectiva con que se abrió el stream.
+    """
+    try:
+        # jwt.decode comprueba la caducidad (exp)
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return False
+    dni_nie = payload.get("sub")
+    if not dni_nie:
+        return False
+    if dni_nie == settings.master_admin_username:
+        return True
+
+    db = SessionLocal()
+    try:
+        user = UserService.get_user_by_dni(db, dni_nie=dni_nie)
+        if user is None or not user.can_login:
+            return False
+        try:
+            company = effective_company_for_request(user, company_hint)
+        except HTTPException:
+            return False
+        return (
+            getattr(user.role, "value", user.role) == subscriber.role
+            and getattr(company, "value", company) == subscriber.company
+        )
+    finally:
+        db.close()
+
+
+async def _event_stream(request: Request, subscriber: EventSubscriber, token: str, company_hint: Optional[str]):
+    heartbeat = max(1, settings.events_heartbeat_seconds)
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + heartbeat
+    try:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        yield _format_event("ready", {"role": subscriber.role, "company": subscriber.company})
+        while True:
+            if loop.time() >= next_check:
+                # Revalidar también con tráfico continuo, no solo cuando salta el latido
+                next_check = loop.time() + heartbeat
+                if not await run_in_threadpool(_session_is_valid, token, company_hint, subscriber):
+                    yield _format_event(EventBus.EVENT_SESSION_ENDED, {})
+                    break
+            if subscriber.lagged:
+                # Se perdieron eventos: el cliente debe recargar sus datos
+                subscriber.lagged = False
+                yield _format_event(EventBus.EVENT_RESYNC, {})
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=max(0.1, next_check - loop.time()))
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                break
+            yield _format_event(event["event"], event["data"], event["id"])
+    finally:
+        EventBus.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Token JWT (EventSource no admite cabeceras)"),
+    company: Optional[str] = Query(None, description="Empresa activa (equivale a X-Company)"),
+    authorization: Optional[str] = Header(default=None),
+    x_company: Optional[str] = Header(default=None, alias="X-Company"),
+):
+    """
+    Abre un stream text/event-stream con los eventos del usuario actual.
+
+    Tipos de evento: vacation.*, inspection.issue_reported, activity.created,
+    user.status_changed, traffic.changed y notifications.changed; además
+    "ready" al conectar, "resync" si se han perdido eventos y "session.ended"
+    antes de cerrar cuando el token caduca o cambian el estado o el rol del usuario.
+    """
+    if not token and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+
+    # La sesión de base de datos solo se usa para autenticar: no se mantiene abierta
+    # durante toda la vida de la conexión
+    db = SessionLocal()
+    try:
+        current_user = await get_current_user(token=token or "", db=db)
+        effective_company = effective_company_for_request(current_user, x_company or company)
+        role = current_user.role
+        user_id = getattr(current_user, "id", None)
+    finally:
+        db.close()
+
+    subscriber = EventBus.subscribe(effective_company, role, user_id)
+    return StreamingResponse(
+        _event_stream(request, subscriber, token or "", x_company or company),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            # nginx: no almacenar en buffer la respuesta
+            "X-Accel-Buffering": "no",
+        },
+    )
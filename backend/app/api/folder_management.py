@@ -8,6 +8,7 @@ from typing import List, Dict, Any
 from app.database.connection import get_db
 from app.services.folder_structure_service import FolderStructureService
 from app.services.user_service import UserService
+from app.services.folder_repair_job import FolderRepairJob
 from app.models.user import User
 from pydantic import BaseModel
 
@@ -222,62 +223,34 @@ async def migrate_user_folder_structure(dni_nie: str, db: Session = Depends(get_
             detail=f"Error migrando estructura: {str(e)}"
         )
 
-@router.post("/folder-management/repair-all")
-async def repair_all_folder_structures(db: Session = Depends(get_db)):
+@router.post("/folder-management/repair-all", status_code=status.HTTP_202_ACCEPTED)
+async def repair_all_folder_structures(resume: bool = True):
     """
-    Repara la estructura de carpetas de todos los usuarios del sistema.
-    Proceso en lote para administradores.
+    Lanza en segundo plano la reparación de la estructura de carpetas de todos
+    los usuarios del sistema. El progreso se consulta en /folder-management/repair-all/status.
+    Con resume=true (por defecto) un trabajo interrumpido continúa donde se quedó.
     """
     try:
-        # Obtener todos los usuarios
-        all_users = UserService.get_all_users(db)
-        
-        results = {
-            "total_users": len(all_users),
-            "repaired": 0,
-            "failed": 0,
-            "details": []
-        }
-        
-        for user in all_users:
-            try:
-                success = FolderStructureService.repair_folder_structure(
-                    user.dni_nie, user.role, user.first_name, user.last_name, user.department
-                )
-                
-                if success:
-                    results["repaired"] += 1
-                    results["details"].append({
-                        "dni_nie": user.dni_nie,
-                        "status": "success",
-                        "message": "Estructura reparada"
-                    })
-                else:
-                    results["failed"] += 1
-                    results["details"].append({
-                        "dni_nie": user.dni_nie,
-                        "status": "failed",
-                        "message": "No se pudo reparar"
-                    })
-                    
-            except Exception as e:
-                results["failed"] += 1
-                results["details"].append({
-                    "dni_nie": user.dni_nie,
-                    "status": "error",
-                    "message": str(e)
-                })
-        
-        return {
-            "message": f"Proceso completado: {results['repaired']} reparadas, {results['failed']} fallidas",
-            "results": results
-        }
-        
+        job = FolderRepairJob.start(resume=resume)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error en proceso de reparación masiva: {str(e)}"
         )
+    return {
+        "message": "Reparación masiva iniciada",
+        "job": job
+    }
+
+@router.get("/folder-management/repair-all/status")
+async def get_repair_all_status():
+    """
+    Estado del trabajo de reparación masiva: idle, running, completed, failed o interrupted,
+    con contadores de usuarios procesados, reparados y fallidos.
+    """
+    return FolderRepairJob.status()
 
 @router.post("/folder-management/initialize-system")
 async def initialize_system_folders():
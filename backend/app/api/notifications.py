@@ -0,0 +1,95 @@
+"""
+Resumen de avisos para los badges del frontend.
+
+Agrupa en una sola petición los contadores que antes se consultaban por separado
+(vacaciones pendientes, incidencias de inspección, órdenes directas y aviso de
+inspección del trabajador). Se sirve desde notification_summary_cache y admite
+peticiones condicionales: si el resumen no ha cambiado se responde 304.
+"""
+import hashlib
+
+from fastapi import APIRouter, Depends, Header, Request, Response
+from sqlalchemy.orm import Session
+
+from app.api.auth import get_current_user
+from app.api.truck_inspections import (
+    DIRECT_ORDER_CREATION_ROLES,
+    _compute_inspection_status,
+    _pending_issues_query,
+    _role_equals,
+    _role_in,
+)
+from app.database.connection import get_db
+from app.models.direct_inspection_order import DirectInspectionOrder
+from app.models.user import User, UserRole
+from app.schemas.notification import NotificationSummary
+from app.services.notification_cache import notification_summary_cache
+from app.services.vacation_cache import cache_key
+from app.services.vacation_pending_counter import VacationPendingCounter
+from app.utils.company_context import effective_company_for_request
+from app.utils.file_delivery import is_not_modified
+
+router = APIRouter()
+
+VACATION_ADMIN_ROLES = [UserRole.ADMINISTRADOR, UserRole.MASTER_ADMIN]
+INSPECTION_ISSUE_ROLES = [UserRole.P_TALLER, UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.TRAFICO]
+
+
+def _build_summary(db: Session, current_user: User, company) -> NotificationSummary:
+    """Calcula los contadores que corresponden al rol del usuario."""
+    role = current_user.role
+    summary = NotificationSummary()
+
+    if _role_in(role, VACATION_ADMIN_ROLES):
+        summary.vacations_pending = VacationPendingCounter.get(db, company)
+
+    if _role_in(role, INSPECTION_ISSUE_ROLES):
+        summary.inspection_issues_pending = _pending_issues_query(db, current_user, company).count()
+
+    if _role_in(role, DIRECT_ORDER_CREATION_ROLES):
+        orders = db.query(DirectInspectionOrder).filter(DirectInspectionOrder.is_reviewed.is_(False))
+        if company is not None:
+            orders = orders.filter(DirectInspectionOrder.company == company)
+        summary.direct_orders_pending = orders.count()
+
+    if _role_equals(role, UserRole.TRABAJADOR):
+        status = _compute_inspection_status(current_user, db)
+        summary.inspection_needed = status.needs_inspection
+        summary.inspection_manual_requests = len(status.manual_requests or [])
+
+    return summary
+
+
+@router.get("/summary", response_model=NotificationSummary)
+async def get_notification_summary(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    x_company: str | None = Header(default=None, alias="X-Company"),
+):
+    """
+    Devuelve todos los contadores de avisos del usuario en una sola respuesta.
+
+    El ETag se deriva del propio resumen, así que un cliente que reenvía
+    If-None-Match recibe 304 mientras ningún contador cambie.
+    """
+    company = effective_company_for_request(current_user, x_company)
+    role_value = getattr(current_user.role, "value", str(current_user.role))
+    # Los avisos de trabajador son personales; el resto se comparten por empresa y rol
+    user_scope = current_user.id if _role_equals(current_user.role, UserRole.TRABAJADOR) else None
+    key = cache_key(company, role_value, user_scope)
+
+    cached = notification_summary_cache.get(key)
+    if cached is None:
+        summary = _build_summary(db, current_user, company)
+        digest = hashlib.sha1(summary.model_dump_json().encode("utf-8")).hexdigest()[:16]
+        cached = (summary, f'W/"{digest}"')
+        notification_summary_cache.set(key, cached)
+    summary, etag = cached
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return summary
@@ -19,8 +19,8 @@ from app.models.company_enum import Company
 router = APIRouter()
 
 # Directorio para almacenar archivos de nómina
+# Se crea al guardar el primer archivo, no al importar el módulo
 PAYROLL_FILES_DIR = Path("backend/files/payroll")
-PAYROLL_FILES_DIR.mkdir(parents=True, exist_ok=True)
 
 # Base de datos simulada de usuarios (se debe reemplazar por consulta real a DB)
 users_db = []
@@ -90,6 +90,7 @@ async def upload_document(
     file_path = PAYROLL_FILES_DIR / unique_filename
     
     # Guardar archivo
+    PAYROLL_FILES_DIR.mkdir(parents=True, exist_ok=True)
     with open(file_path, "wb") as buffer:
         content = await file.read()
         buffer.write(content)
@@ -555,6 +556,7 @@ async def upload_document_for_user(
     file_path = PAYROLL_FILES_DIR / unique_filename
     
     # Guardar archivo
+    PAYROLL_FILES_DIR.mkdir(parents=True, exist_ok=True)
     with open(file_path, "wb") as buffer:
         content = await file.read()
         buffer.write(content)
@@ -4,25 +4,48 @@ Elimina la simulación previa y opera directamente sobre el filesystem
 usando settings.traffic_files_base_path.
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, Response
 from pydantic import BaseModel, field_validator
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
+import asyncio
+import hashlib
+import json
 import os
 import shutil
+import threading
 import unicodedata
 
 from app.config import settings
+from app.utils.file_delivery import serve_file
+from app.utils.conditional_request import list_etag, not_modified, set_etag
+from app.utils.zip_stream import iter_folder_files, zip_streaming_response
+from app.services.traffic_search_service import TrafficSearchIndex
+from app.services.event_bus import EventBus
 
 router = APIRouter()
 
+# El directorio se crea en el arranque de la aplicación (config.ensure_storage_directories)
 BASE_PATH = Path(settings.traffic_files_base_path).resolve()
-BASE_PATH.mkdir(parents=True, exist_ok=True)
 
 ILLEGAL_CHARS = set('<>:\\"|?*')
 
+# Roles con acceso a Tráfico que reciben los avisos de cambios por SSE
+TRAFFIC_EVENT_ROLES = ["P_TALLER", "TRAFICO", "ADMINISTRADOR", "ADMINISTRACION", "MASTER_ADMIN"]
+
+
+def _notify_change(action: str, path: Path) -> None:
+    """Publica un cambio del árbol de Tráfico (la carpeta afectada, relativa a la raíz)."""
+    EventBus.publish(
+        EventBus.EVENT_TRAFFIC_CHANGED,
+        {"action": action, "path": path.relative_to(BASE_PATH).as_posix()},
+        roles=TRAFFIC_EVENT_ROLES,
+    )
+
 
 def _secure_name(name: str) -> str:
     # Normalizar y eliminar caracteres no permitidos
@@ -110,6 +133,8 @@ def create_folder(payload: TrafficFolderCreate):
         raise HTTPException(status_code=409, detail="La carpeta ya existe")
 
     new_dir.mkdir(parents=False, exist_ok=False)
+    TrafficSearchIndex.add(new_dir.relative_to(BASE_PATH).as_posix(), is_dir=True)
+    _notify_change("folder_created", parent_dir)
     stat = new_dir.stat()
     return TrafficFolderInfo(
         name=new_dir.name,
@@ -131,6 +156,8 @@ def delete_folder(path: str = Query(..., description="Ruta relativa de la carpet
         shutil.rmtree(target)
     else:
         target.rmdir()
+    TrafficSearchIndex.remove(target.relative_to(BASE_PATH).as_posix())
+    _notify_change("folder_deleted", target.parent)
     return {"message": "Carpeta eliminada"}
 
 
@@ -139,72 +166,372 @@ class UploadResponse(BaseModel):
 
 
 @router.get('/files', response_model=List[TrafficFileInfo])
-def list_files(path: Optional[str] = Query(None, description="Ruta relativa de la carpeta")):
+def list_files(
+    request: Request,
+    response: Response,
+    path: Optional[str] = Query(None, description="Ruta relativa de la carpeta"),
+):
+    """
+    Archivos de una carpeta. El ETag se deriva del sello del directorio (nombre,
+    tamaño y mtime de cada entrada), así que un refresco sin cambios recibe 304
+    sin serializar el listado.
+    """
     target = _resolve_relative(path)
     if not target.exists():
         # Crear automáticamente la carpeta solicitada para no devolver 404
         target.mkdir(parents=True, exist_ok=True)
     if not target.is_dir():
         raise HTTPException(status_code=400, detail="La ruta no es un directorio")
+
+    listing = _read_directory(target)
+    etag = list_etag(request, listing[0])
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+
+    # Listado compartido con /tree (ignora Thumbs.db y desktop.ini)
+    _, _, files = _scan_directory(target, listing)
+    return files
+
+
+class TrafficTreeNode(BaseModel):
+    name: str
+    relative_path: str
+    created_at: datetime
+    updated_at: datetime
+    type: str = "folder"
+    folders: List["TrafficTreeNode"] = []
     files: List[TrafficFileInfo] = []
-    for entry in sorted(target.iterdir()):
-        if entry.is_file():
-            # Ignorar archivos de sistema de Windows que no aportan valor en la UI
-            if entry.name.lower() in {"thumbs.db", "desktop.ini"}:
+    # True si tiene subcarpetas que no se han expandido por el límite de profundidad
+    truncated: bool = False
+
+
+IGNORED_FILES = {"thumbs.db", "desktop.ini"}
+_DIR_CACHE_MAX_ENTRIES = 4096
+# Entrada de un listado: (nombre, es carpeta, stat de la entrada)
+DirListing = Tuple[str, List[Tuple[str, bool, os.stat_result]]]
+# Caché de listados ya convertidos: ruta absoluta -> (sello, carpetas, archivos)
+_dir_cache: "OrderedDict[str, Tuple[str, List[TrafficFolderInfo], List[TrafficFileInfo]]]" = OrderedDict()
+_dir_cache_lock = threading.Lock()
+
+
+def _read_directory(directory: Path) -> DirListing:
+    """
+    Lista un directorio con os.scandir y hace stat de cada entrada.
+
+    Devuelve un sello (hash de nombre, tamaño y mtime_ns de cada entrada y del
+    propio directorio) junto con las entradas. Sobrescribir un archivo no cambia
+    el mtime del directorio, pero sí el de la entrada, así que el sello lo detecta.
+    """
+    digest = hashlib.sha1(str(os.stat(directory).st_mtime_ns).encode("ascii"))
+    entries: List[Tuple[str, bool, os.stat_result]] = []
+    with os.scandir(directory) as it:
+        for entry in sorted(it, key=lambda e: e.name):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append((entry.name, True, entry.stat(follow_symlinks=False)))
+                elif entry.is_file() and entry.name.lower() not in IGNORED_FILES:
+                    entries.append((entry.name, False, entry.stat()))
+                else:
+                    continue
+            except FileNotFoundError:
+                # Entrada eliminada durante el listado
                 continue
-            stat = entry.stat()
+            stat = entries[-1][2]
+            digest.update(f"\0{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest(), entries
+
+
+def _scan_directory(
+    directory: Path,
+    listing: Optional[DirListing] = None,
+) -> Tuple[str, List[TrafficFolderInfo], List[TrafficFileInfo]]:
+    """
+    Carpetas y archivos de un directorio. Los modelos ya construidos se reutilizan
+    mientras el sello de _read_directory no cambie.
+    """
+    key = str(directory)
+    stamp, entries = listing if listing is not None else _read_directory(directory)
+    with _dir_cache_lock:
+        cached = _dir_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            _dir_cache.move_to_end(key)
+            return cached
+
+    folders: List[TrafficFolderInfo] = []
+    files: List[TrafficFileInfo] = []
+    for name, is_dir, stat in entries:
+        try:
+            relative_path = (directory / name).relative_to(BASE_PATH).as_posix()
+        except ValueError:
+            # Fuera de la raíz
+            continue
+        if is_dir:
+            folders.append(TrafficFolderInfo(
+                name=name,
+                relative_path=relative_path,
+                created_at=datetime.fromtimestamp(stat.st_ctime),
+                updated_at=datetime.fromtimestamp(stat.st_mtime),
+                type="folder"
+            ))
+        else:
             files.append(TrafficFileInfo(
-                name=entry.name,
-                relative_path=entry.relative_to(BASE_PATH).as_posix(),
+                name=name,
+                relative_path=relative_path,
                 size=stat.st_size,
-                mime_type=None,  # Se podría inferir con mimetypes
+                mime_type=None,
                 created_at=datetime.fromtimestamp(stat.st_ctime),
                 updated_at=datetime.fromtimestamp(stat.st_mtime)
             ))
-    return files
+
+    result = (stamp, folders, files)
+    with _dir_cache_lock:
+        _dir_cache[key] = result
+        _dir_cache.move_to_end(key)
+        while len(_dir_cache) > _DIR_CACHE_MAX_ENTRIES:
+            _dir_cache.popitem(last=False)
+    return result
+
+
+def _collect_listings(directory: Path, depth: int, listings: "OrderedDict[Path, DirListing]") -> None:
+    """Lee (sin construir modelos) los directorios que formarán el árbol."""
+    listing = _read_directory(directory)
+    listings[directory] = listing
+    if depth <= 0:
+        return
+    for name, is_dir, _ in listing[1]:
+        if not is_dir:
+            continue
+        try:
+            _collect_listings(directory / name, depth - 1, listings)
+        except FileNotFoundError:
+            continue
+
+
+def _build_tree(directory: Path, depth: int, listings: "OrderedDict[Path, DirListing]") -> TrafficTreeNode:
+    _, folders, files = _scan_directory(directory, listings[directory])
+    relative_path = directory.relative_to(BASE_PATH).as_posix() if directory != BASE_PATH else ""
+    stat = directory.stat()
+    node = TrafficTreeNode(
+        name=directory.name if directory != BASE_PATH else "",
+        relative_path=relative_path,
+        created_at=datetime.fromtimestamp(stat.st_ctime),
+        updated_at=datetime.fromtimestamp(stat.st_mtime),
+        files=files,
+    )
+    if depth <= 0:
+        node.truncated = bool(folders)
+        return node
+    for folder in folders:
+        child = BASE_PATH / folder.relative_path
+        if child in listings:
+            node.folders.append(_build_tree(child, depth - 1, listings))
+    return node
+
+
+@router.get('/tree', response_model=TrafficTreeNode)
+def get_tree(
+    request: Request,
+    response: Response,
+    path: Optional[str] = Query(None, description="Ruta relativa de la carpeta raíz del árbol"),
+    depth: int = Query(1, ge=0, le=10, description="Niveles de subcarpetas a incluir"),
+):
+    """
+    Devuelve carpetas y archivos hasta la profundidad indicada en una sola respuesta.
+    El ETag se deriva de los sellos de cada directorio (stat de todas sus entradas)
+    y se comprueba antes de construir el árbol: un refresco sin cambios recibe 304.
+    """
+    target = _resolve_relative(path)
+    if not target.exists():
+        raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+    if not target.is_dir():
+        raise HTTPException(status_code=400, detail="La ruta no es un directorio")
+
+    listings: "OrderedDict[Path, DirListing]" = OrderedDict()
+    _collect_listings(target, depth, listings)
+    etag = list_etag(
+        request,
+        *(f"{directory.relative_to(BASE_PATH).as_posix()}:{listing[0]}" for directory, listing in listings.items()),
+    )
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+    return _build_tree(target, depth, listings)
+
+
+UPLOAD_COPY_BUFFER = 1024 * 1024
+
+
+def _create_unique_file(directory: Path, safe_name: str) -> Tuple[Path, int]:
+    """
+    Crea el archivo destino de forma atómica con O_EXCL, probando "nombre (n).ext"
+    hasta encontrar uno libre. Evita la carrera entre exists() y open() cuando
+    varias subidas concurrentes usan el mismo nombre.
+    """
+    base_name = Path(safe_name).stem
+    suffix = Path(safe_name).suffix
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    candidate = directory / safe_name
+    counter = 1
+    while True:
+        try:
+            return candidate, os.open(candidate, flags, 0o644)
+        except FileExistsError:
+            candidate = directory / f"{base_name} ({counter}){suffix}"
+            counter += 1
+
+
+def _save_upload(directory: Path, upload: UploadFile, safe_name: str) -> TrafficFileInfo:
+    destination, fd = _create_unique_file(directory, safe_name)
+    try:
+        with os.fdopen(fd, 'wb', buffering=0) as out:
+            upload.file.seek(0)
+            shutil.copyfileobj(upload.file, out, UPLOAD_COPY_BUFFER)
+    except Exception:
+        # No dejar archivos a medias
+        destination.unlink(missing_ok=True)
+        raise
+    TrafficSearchIndex.add(destination.relative_to(BASE_PATH).as_posix())
+    stat = destination.stat()
+    return TrafficFileInfo(
+        name=destination.name,
+        relative_path=destination.relative_to(BASE_PATH).as_posix(),
+        size=stat.st_size,
+        mime_type=upload.content_type,
+        created_at=datetime.fromtimestamp(stat.st_ctime),
+        updated_at=datetime.fromtimestamp(stat.st_mtime)
+    )
+
+
+def _discard_uploads(saved: List[TrafficFileInfo]) -> None:
+    for info in saved:
+        (BASE_PATH / info.relative_path).unlink(missing_ok=True)
+        TrafficSearchIndex.remove(info.relative_path)
 
 
 @router.post('/upload', response_model=UploadResponse, status_code=201)
-def upload_files(target_path: Optional[str] = Form(None), files: List[UploadFile] = File(...)):
+async def upload_files(
+    target_path: Optional[str] = Form(None),
+    files: List[UploadFile] = File(...),
+    stream: bool = Query(False, description="Devolver el resultado de cada archivo en NDJSON según termina"),
+):
+    """
+    Sube varios archivos escribiéndolos en paralelo (hasta
+    settings.traffic_upload_concurrency a la vez) fuera del event loop.
+    Con stream=true la respuesta es NDJSON con una línea por archivo en orden de
+    finalización, incluidos los errores individuales.
+    """
     directory = _resolve_relative(target_path)
     if not directory.exists():
         raise HTTPException(status_code=404, detail="Carpeta destino no existe")
     if not directory.is_dir():
         raise HTTPException(status_code=400, detail="Ruta destino no es un directorio")
 
-    saved: List[TrafficFileInfo] = []
-    for f in files:
-        if not f.filename:
+    # Validar todos los nombres antes de escribir nada
+    pending = [(f, _secure_name(f.filename)) for f in files if f.filename]
+    semaphore = asyncio.Semaphore(max(1, settings.traffic_upload_concurrency))
+
+    async def save(upload: UploadFile, safe_name: str) -> TrafficFileInfo:
+        async with semaphore:
+            return await run_in_threadpool(_save_upload, directory, upload, safe_name)
+
+    if not stream:
+        results = await asyncio.gather(*(save(f, name) for f, name in pending), return_exceptions=True)
+        saved = [result for result in results if isinstance(result, TrafficFileInfo)]
+        failure = next((result for result in results if isinstance(result, BaseException)), None)
+        if failure is not None:
+            # Todo o nada, como la subida secuencial: se eliminan los archivos ya escritos
+            await run_in_threadpool(_discard_uploads, saved)
+            raise failure
+        if saved:
+            _notify_change("upload", directory)
+        return UploadResponse(files=saved)
+
+    async def save_reporting(upload: UploadFile, safe_name: str) -> dict:
+        try:
+            info = await save(upload, safe_name)
+            return {"status": "ok", "file": info.model_dump(mode="json")}
+        except Exception as e:
+            return {"status": "error", "name": upload.filename, "detail": str(e)}
+
+    async def results_stream():
+        written = 0
+        for finished in asyncio.as_completed([save_reporting(f, name) for f, name in pending]):
+            result = await finished
+            if result["status"] == "ok":
+                written += 1
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        # Igual que en el modo no streaming: solo se avisa si se escribió algún archivo
+        if written:
+            _notify_change("upload", directory)
+
+    return StreamingResponse(results_stream(), status_code=201, media_type="application/x-ndjson")
+
+
+class TrafficSearchResult(BaseModel):
+    name: str
+    relative_path: str
+    type: str
+    size: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+
+class TrafficSearchResponse(BaseModel):
+    query: str
+    total: int
+    results: List[TrafficSearchResult]
+
+
+@router.get('/search', response_model=TrafficSearchResponse)
+def search(
+    q: str = Query(..., min_length=2, description="Texto a buscar en los nombres"),
+    mode: str = Query("substring", pattern="^(substring|prefix)$"),
+    path: Optional[str] = Query(None, description="Limitar la búsqueda a esta carpeta"),
+    type: Optional[str] = Query(None, pattern="^(file|folder)$"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Busca archivos y carpetas por nombre en todo el árbol de Tráfico (sin distinguir tildes)."""
+    if path:
+        _resolve_relative(path)
+    matches, total = TrafficSearchIndex.search(q, prefix=mode == "prefix", path=path, entry_type=type, limit=limit)
+    results: List[TrafficSearchResult] = []
+    for relative_path, is_dir in matches:
+        full_path = BASE_PATH / relative_path
+        try:
+            stat = full_path.stat()
+        except FileNotFoundError:
+            # Borrado fuera de la API: se limpiará en la próxima reconstrucción
+            TrafficSearchIndex.remove(relative_path)
+            total -= 1
             continue
-        safe_name = _secure_name(f.filename)
-        destination = directory / safe_name
-        # Evitar sobrescritura
-        counter = 1
-        base_name = destination.stem
-        suffix = destination.suffix
-        while destination.exists():
-            destination = directory / f"{base_name} ({counter}){suffix}"
-            counter += 1
-        with open(destination, 'wb') as out:
-            shutil.copyfileobj(f.file, out)
-        stat = destination.stat()
-        saved.append(TrafficFileInfo(
-            name=destination.name,
-            relative_path=destination.relative_to(BASE_PATH).as_posix(),
-            size=stat.st_size,
-            mime_type=f.content_type,
-            created_at=datetime.fromtimestamp(stat.st_ctime),
-            updated_at=datetime.fromtimestamp(stat.st_mtime)
+        results.append(TrafficSearchResult(
+            name=full_path.name,
+            relative_path=relative_path,
+            type="folder" if is_dir else "file",
+            size=None if is_dir else stat.st_size,
+            updated_at=datetime.fromtimestamp(stat.st_mtime),
         ))
-    return UploadResponse(files=saved)
+    return TrafficSearchResponse(query=q, total=total, results=results)
 
 
 @router.get('/download')
-def download_file(path: str = Query(..., description="Ruta relativa del archivo")):
+def download_file(request: Request, path: str = Query(..., description="Ruta relativa del archivo")):
     file_path = _resolve_relative(path)
     if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
-    return FileResponse(str(file_path), filename=file_path.name)
+    return serve_file(request, file_path, filename=file_path.name)
+
+
+@router.get('/export')
+def export_folder(path: Optional[str] = Query(None, description="Ruta relativa de la carpeta a exportar")):
+    """Descarga una carpeta completa (con subcarpetas) como ZIP generado en streaming."""
+    folder = _resolve_relative(path)
+    if not folder.exists() or not folder.is_dir():
+        raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+    zip_name = f"{folder.name if folder != BASE_PATH else 'trafico'}.zip"
+    return zip_streaming_response(iter_folder_files(folder, folder), zip_name)
 
 
 @router.delete('/files')
@@ -213,10 +540,12 @@ def delete_file(path: str = Query(..., description="Ruta relativa del archivo a
     if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     file_path.unlink()
+    TrafficSearchIndex.remove(file_path.relative_to(BASE_PATH).as_posix())
+    _notify_change("file_deleted", file_path.parent)
     return {"message": "Archivo eliminado"}
 
 @router.get('/preview/{relative_path:path}')
-def preview_file(relative_path: str):
+def preview_file(relative_path: str, request: Request):
     """Previsualizar archivo (especialmente PDFs) en el navegador"""
     file_path = _resolve_relative(relative_path)
     if not file_path.exists():
@@ -235,12 +564,7 @@ def preview_file(relative_path: str):
         content_type = 'application/pdf'
     
     # Retornar archivo para visualización (sin forzar descarga)
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        path=str(file_path),
-        media_type=content_type,
-        headers={"Content-Disposition": "inline"}
-    )
+    return serve_file(request, file_path, media_type=content_type, disposition="inline")
 
 
 
@@ -2,13 +2,15 @@
 """API endpoints para inspecciones de camiones."""
 import json
 import os
+import tempfile
+import threading
 from datetime import datetime, timedelta, timezone
 from typing import Any, List, Optional, Tuple, cast
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi import status as http_status
-from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func, and_, or_
+from sqlalchemy import and_, case, desc, func, insert, literal, select
 
 from app.database.connection import get_db
 from app.models.user import MasterAdminUser, User, UserRole, UserStatus
@@ -21,6 +23,8 @@ from app.schemas.truck_inspection import (
     TruckInspectionSummary,
     InspectionNeededResponse,
     InspectionStatsResponse,
+    InspectionPlateStats,
+    InspectionDayStats,
     ImageUploadResponse,
     TruckInspectionRequestCreate,
     TruckInspectionRequestResult,
@@ -42,17 +46,26 @@ from app.models.direct_inspection_order import (
     VehicleKind,
 )
 from app.api.auth import get_current_user
+from app.config import settings as app_settings
 from app.services.activity_service import ActivityService
+from app.services.inspection_image_service import InspectionImageService
 from app.utils.company_context import effective_company_for_request
+from app.utils.file_delivery import register_delivery_root, serve_file
+from app.utils.keyset import after_cursor, set_next_cursor
+from app.utils.conditional_request import list_etag, not_modified, query_version, set_etag
+from app.services.notification_cache import invalidate_notification_summary
+from app.services.event_bus import EventBus
+from app.services.inspection_status_cache import inspection_status_cache, invalidate_inspection_status
 
 router = APIRouter()
 
 # Configuración
 TRUCK_INSPECTION_FOLDER = "files/truck_inspections"
+register_delivery_root("truck_inspections", TRUCK_INSPECTION_FOLDER)
 INSPECTION_INTERVAL_DAYS = 15  # 2 veces al mes = cada 15 días
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
-AUTO_INSPECTION_SETTINGS_FILE = "truck_inspection_settings.json"
+AUTO_INSPECTION_SETTINGS_FILE = app_settings.auto_inspection_settings_file
 
 AUTO_INSPECTION_MANAGEMENT_ROLES: list[UserRole] = [
     UserRole.P_TALLER,
@@ -71,45 +84,88 @@ DIRECT_ORDER_CREATION_ROLES: list[UserRole] = [
 ]
 
 
+# Configuración en memoria: ((inodo, mtime_ns, tamaño) del archivo leído, configuración).
+# Cada consulta solo hace un stat(); el archivo se relee cuando otro worker lo reescribe
+# (os.replace crea un inodo nuevo, así que el cambio se detecta aunque el mtime coincida).
+_auto_settings_cache: Optional[Tuple[Tuple[int, int, int], AutoInspectionSettings]] = None
+_auto_settings_lock = threading.Lock()
+
+
+def _default_auto_inspection_settings() -> AutoInspectionSettings:
+    return AutoInspectionSettings(
+        auto_inspection_enabled=True,
+        updated_at=None,
+        updated_by=None,
+        updated_by_id=None,
+    )
+
+
+def _settings_file_stamp() -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(AUTO_INSPECTION_SETTINGS_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
 def _load_auto_inspection_settings() -> AutoInspectionSettings:
-    """Carga la configuración de inspecciones automáticas desde archivo."""
-
-    if not os.path.exists(AUTO_INSPECTION_SETTINGS_FILE):
-        default_settings = AutoInspectionSettings(
-            auto_inspection_enabled=True,
-            updated_at=None,
-            updated_by=None,
-            updated_by_id=None,
-        )
+    """Devuelve la configuración de inspecciones automáticas (releída solo si el archivo cambió)."""
+    global _auto_settings_cache
+
+    stamp = _settings_file_stamp()
+    cached = _auto_settings_cache
+    if cached is not None and stamp is not None and cached[0] == stamp:
+        return cached[1]
+
+    if stamp is None:
+        default_settings = _default_auto_inspection_settings()
         _save_auto_inspection_settings(default_settings)
         return default_settings
 
     try:
         with open(AUTO_INSPECTION_SETTINGS_FILE, "r", encoding="utf-8") as file:
             data = json.load(file)
-        return AutoInspectionSettings.model_validate(data)
+        loaded = AutoInspectionSettings.model_validate(data)
     except Exception as exc:  # pragma: no cover - fallback
         print(f"ERROR cargando configuración de inspecciones automáticas: {exc}")
-        return AutoInspectionSettings(
-            auto_inspection_enabled=True,
-            updated_at=None,
-            updated_by=None,
-            updated_by_id=None,
-        )
+        return _default_auto_inspection_settings()
+
+    with _auto_settings_lock:
+        _auto_settings_cache = (stamp, loaded)
+    return loaded
 
 
 def _save_auto_inspection_settings(settings: AutoInspectionSettings) -> None:
-    """Guarda la configuración de inspecciones automáticas en archivo."""
+    """
+    Guarda la configuración de forma atómica (archivo temporal + os.replace) para que
+    otros workers nunca lean un JSON a medio escribir, y actualiza la copia en memoria.
+    """
+    global _auto_settings_cache
 
+    directory = os.path.dirname(os.path.abspath(AUTO_INSPECTION_SETTINGS_FILE))
+    tmp_path = None
     try:
-        with open(AUTO_INSPECTION_SETTINGS_FILE, "w", encoding="utf-8") as file:
+        fd, tmp_path = tempfile.mkstemp(prefix=".truck_inspection_settings.", suffix=".tmp", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
             json.dump(settings.model_dump(mode="json"), file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, AUTO_INSPECTION_SETTINGS_FILE)
+        tmp_path = None
     except Exception as exc:  # pragma: no cover - filesystem issues
         print(f"ERROR guardando configuración de inspecciones automáticas: {exc}")
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="No se pudo guardar la configuración de inspecciones automáticas.",
         )
+    finally:
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    stamp = _settings_file_stamp()
+    with _auto_settings_lock:
+        _auto_settings_cache = (stamp, settings) if stamp is not None else None
 
 
 def _user_can_manage_auto_settings(user: User | MasterAdminUser) -> bool:
@@ -173,26 +229,57 @@ def _build_inspection_summary(inspection: TruckInspection) -> TruckInspectionSum
     )
 
 
-def _compute_inspection_status(current_user: User, db: Session) -> InspectionNeededResponse:
-    settings = _load_auto_inspection_settings()
-    auto_enabled = settings.auto_inspection_enabled
+# Columnas de estado por componente y su nombre en las estadísticas
+COMPONENT_STATUS_COLUMNS = [
+    (TruckInspection.tires_status, "neumáticos"),
+    (TruckInspection.brakes_status, "frenos"),
+    (TruckInspection.lights_status, "luces"),
+    (TruckInspection.fluids_status, "fluidos"),
+    (TruckInspection.documentation_status, "documentación"),
+    (TruckInspection.body_status, "carrocería"),
+]
 
-    if not _role_equals(current_user.role, UserRole.TRABAJADOR):
-        return InspectionNeededResponse(
-            needs_inspection=False,
-            last_inspection_date=None,
-            next_inspection_date=None,
-            days_since_last_inspection=None,
-            message="Solo los trabajadores necesitan realizar inspecciones",
-            inspection_interval_days=INSPECTION_INTERVAL_DAYS,
-            auto_inspection_enabled=auto_enabled,
-        )
+
+def _inspection_company_filter(effective_company: Any):
+    """
+    Inspecciones de la empresa. Las inspecciones legacy sin empresa se rellenaron
+    con la del trabajador (migración e3a91f5c7b20), así que basta con la columna.
+    """
+
+    return TruckInspection.company == effective_company
+
+
+def _pending_issues_query(db: Session, current_user: User, effective_company: Any):
+    """Inspecciones con incidencias de los últimos 30 días aún no revisadas, acotadas por empresa."""
+
+    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+
+    # Query base: incidencias recientes y no revisadas. Se escribe igual que el
+    # predicado del índice parcial (has_issues AND NOT is_reviewed) para que se use
+    query = db.query(TruckInspection).filter(
+        TruckInspection.has_issues,
+        ~TruckInspection.is_reviewed,
+        TruckInspection.inspection_date >= thirty_days_ago,
+    )
+
+    if effective_company is not None:
+        query = query.filter(_inspection_company_filter(effective_company))
+    elif current_user.role in [UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.P_TALLER]:
+        # Si es admin pero no tiene empresa definida, no mostrar nada por seguridad
+        query = query.filter(TruckInspection.id == 0)  # Fuerza resultado vacío
+    return query
+
+
+def _load_driver_inspection_state(
+    db: Session, user_id: int
+) -> Tuple[Optional[datetime], List[ManualInspectionRequest]]:
+    """Fecha (UTC) de la última inspección del conductor y sus solicitudes manuales pendientes."""
 
     pending_requests = (
         db.query(TruckInspectionRequest)
         .options(joinedload(TruckInspectionRequest.requester))
         .filter(
-            TruckInspectionRequest.target_user_id == current_user.id,
+            TruckInspectionRequest.target_user_id == user_id,
             TruckInspectionRequest.status == InspectionRequestStatus.PENDING,
         )
         .order_by(desc(TruckInspectionRequest.created_at))
@@ -208,16 +295,47 @@ def _compute_inspection_status(current_user: User, db: Session) -> InspectionNee
         )
         for request in pending_requests
     ]
-    has_manual_requests = len(manual_requests_payload) > 0
 
-    last_inspection = (
-        db.query(TruckInspection)
-        .filter(TruckInspection.user_id == current_user.id)
-        .order_by(desc(TruckInspection.inspection_date))
-        .first()
+    # Solo se necesita la fecha: max() evita cargar la fila completa
+    last_inspection_date = (
+        db.query(func.max(TruckInspection.inspection_date))
+        .filter(TruckInspection.user_id == user_id)
+        .scalar()
     )
+    if last_inspection_date is not None and (
+        last_inspection_date.tzinfo is None or last_inspection_date.utcoffset() is None
+    ):
+        last_inspection_date = last_inspection_date.replace(tzinfo=timezone.utc)
+
+    return last_inspection_date, manual_requests_payload
 
-    if not last_inspection:
+
+def _compute_inspection_status(current_user: User, db: Session) -> InspectionNeededResponse:
+    """
+    Estado de inspección del conductor. Los datos de base de datos salen de
+    inspection_status_cache; los días transcurridos se recalculan en cada llamada.
+    """
+    settings = _load_auto_inspection_settings()
+    auto_enabled = settings.auto_inspection_enabled
+
+    if not _role_equals(current_user.role, UserRole.TRABAJADOR):
+        return InspectionNeededResponse(
+            needs_inspection=False,
+            last_inspection_date=None,
+            next_inspection_date=None,
+            days_since_last_inspection=None,
+            message="Solo los trabajadores necesitan realizar inspecciones",
+            inspection_interval_days=INSPECTION_INTERVAL_DAYS,
+            auto_inspection_enabled=auto_enabled,
+        )
+
+    last_inspection_date, manual_requests_payload = inspection_status_cache.get_or_set(
+        cast(int, current_user.id),
+        lambda: _load_driver_inspection_state(db, cast(int, current_user.id)),
+    )
+    has_manual_requests = len(manual_requests_payload) > 0
+
+    if last_inspection_date is None:
         if has_manual_requests:
             message = "Tienes una solicitud manual de inspección pendiente. Realiza la inspección para atenderla."
             return InspectionNeededResponse(
@@ -259,10 +377,6 @@ def _compute_inspection_status(current_user: User, db: Session) -> InspectionNee
             auto_inspection_enabled=auto_enabled,
         )
 
-    last_inspection_date = cast(datetime, last_inspection.inspection_date)
-    if last_inspection_date.tzinfo is None or last_inspection_date.utcoffset() is None:
-        last_inspection_date = last_inspection_date.replace(tzinfo=timezone.utc)
-
     now_utc = datetime.now(timezone.utc)
     days_since = (now_utc - last_inspection_date).days
     next_inspection_date: Optional[datetime] = None
@@ -375,6 +489,7 @@ async def create_direct_inspection_order(
         module_entities.append(module_entity)
 
     db.commit()
+    invalidate_notification_summary(effective_company)
     db.refresh(order)
     for m in module_entities:
         db.refresh(m)
@@ -414,9 +529,11 @@ async def create_direct_inspection_order(
 
 @router.get("/direct-orders", response_model=List[DirectInspectionOrderSummary])
 async def get_direct_inspection_orders(
+    response: Response,
     is_reviewed: Optional[bool] = None,
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0, description="Obsoleto: usar cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor de la cabecera X-Next-Cursor de la página anterior"),
     current_user: User | MasterAdminUser = Depends(get_current_user),
     db: Session = Depends(get_db),
     x_company: Optional[str] = Header(None, alias="X-Company"),
@@ -425,6 +542,9 @@ async def get_direct_inspection_orders(
     
     Filtrable por estado de revisión. Personal de taller y administradores
     ven las órdenes de su empresa.
+    
+    Paginación por cursor sobre (created_at, id): si la página sale completa, la
+    cabecera X-Next-Cursor trae el valor para pedir la siguiente.
     """
     
     role_value = getattr(current_user, "role", None)
@@ -436,9 +556,15 @@ async def get_direct_inspection_orders(
     
     effective_company = effective_company_for_request(current_user, x_company)
     
-    query = db.query(DirectInspectionOrder).options(
-        joinedload(DirectInspectionOrder.created_by),
-        joinedload(DirectInspectionOrder.modules)
+    # Número de módulos con una subconsulta correlacionada (sin cargar los módulos)
+    modules_count = (
+        select(func.count(DirectInspectionOrderModule.id))
+        .where(DirectInspectionOrderModule.order_id == DirectInspectionOrder.id)
+        .correlate(DirectInspectionOrder)
+        .scalar_subquery()
+    )
+    query = db.query(DirectInspectionOrder, modules_count).options(
+        joinedload(DirectInspectionOrder.created_by)
     )
     
     # Filtrar por empresa
@@ -449,11 +575,19 @@ async def get_direct_inspection_orders(
     if is_reviewed is not None:
         query = query.filter(DirectInspectionOrder.is_reviewed == is_reviewed)
     
-    query = query.order_by(desc(DirectInspectionOrder.created_at))
-    orders = query.offset(offset).limit(limit).all()
+    query = query.order_by(desc(DirectInspectionOrder.created_at), desc(DirectInspectionOrder.id))
+    if cursor:
+        query = query.filter(after_cursor(DirectInspectionOrder.created_at, DirectInspectionOrder.id, cursor))
+    elif offset:
+        query = query.offset(offset)
+    rows = query.limit(limit).all()
+    
+    if len(rows) == limit:
+        last_order = rows[-1][0]
+        set_next_cursor(response, last_order.created_at, last_order.id)
     
     results = []
-    for order in orders:
+    for order, order_modules_count in rows:
         creator_name = getattr(order.created_by, "full_name", None) if order.created_by else "Desconocido"
         company_val = getattr(order.company, "value", order.company) if order.company else None
         
@@ -472,7 +606,7 @@ async def get_direct_inspection_orders(
             created_by=creator_name or "Desconocido",
             company=str(company_val) if company_val else None,
             is_reviewed=bool(is_reviewed_val),
-            modules_count=len(order.modules) if order.modules else 0,
+            modules_count=int(order_modules_count or 0),
         ))
     
     return results
@@ -580,6 +714,7 @@ async def mark_direct_order_reviewed(
     setattr(order, "revision_notes", payload.revision_notes)
     
     db.commit()
+    invalidate_notification_summary(getattr(order, "company", None))
     
     reviewer_name = getattr(current_user, "full_name", None) or getattr(current_user, "username", "Equipo de Taller")
     
@@ -634,6 +769,8 @@ async def update_auto_inspection_settings_endpoint(
     )
 
     _save_auto_inspection_settings(updated_settings)
+    invalidate_notification_summary()
+    invalidate_inspection_status()
 
     try:
         ActivityService.log_from_user(
@@ -683,6 +820,8 @@ async def check_inspection_needed(
 
 @router.get('/', response_model=List[TruckInspectionSummary])
 async def get_inspections(
+    request: Request,
+    response: Response,
     user_id: Optional[int] = None,
     truck_license_plate: Optional[str] = None,
     has_issues: Optional[bool] = None,
@@ -696,10 +835,10 @@ async def get_inspections(
     Obtiene inspecciones con filtros opcionales.
     Los trabajadores solo ven sus propias inspecciones.
     El personal de taller y administradores ven todas las inspecciones de su empresa.
+    Admite If-None-Match: si las inspecciones filtradas no han cambiado responde 304.
     """
-    query = db.query(TruckInspection).options(
-        joinedload(TruckInspection.user)
-    )
+    query = db.query(TruckInspection)
+    effective_company = None
     
     # Control de acceso por rol
     if _role_equals(current_user.role, UserRole.TRABAJADOR):
@@ -713,15 +852,7 @@ async def get_inspections(
         # Aplicar filtro por empresa usando el contexto de empresa efectiva
         effective_company = effective_company_for_request(current_user, x_company)
         if effective_company is not None:
-            query = query.filter(
-                or_(
-                    TruckInspection.company == effective_company,
-                    and_(
-                        TruckInspection.company.is_(None),
-                        TruckInspection.user.has(User.company == effective_company)
-                    )
-                )
-            )
+            query = query.filter(_inspection_company_filter(effective_company))
         elif _role_in(current_user.role, [UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.P_TALLER]):
             # Si es admin pero no tiene empresa definida, no mostrar nada por seguridad
             query = query.filter(TruckInspection.id == 0)  # Fuerza resultado vacío
@@ -738,8 +869,20 @@ async def get_inspections(
     if has_issues is not None:
         query = query.filter(TruckInspection.has_issues == has_issues)
     
+    # Respuesta condicional a partir del sello de versión del conjunto filtrado
+    etag = list_etag(
+        request,
+        getattr(effective_company, "value", effective_company),
+        current_user.id,
+        *query_version(query, TruckInspection.id, TruckInspection.updated_at),
+    )
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+
     # Ordenar por fecha descendente
-    query = query.order_by(desc(TruckInspection.inspection_date))
+    query = query.options(joinedload(TruckInspection.user)).order_by(desc(TruckInspection.inspection_date))
     
     # Paginación
     inspections = query.offset(offset).limit(limit).all()
@@ -748,6 +891,80 @@ async def get_inspections(
     return [_build_inspection_summary(inspection) for inspection in inspections]
 
 
+def _insert_manual_inspection_requests(
+    db: Session,
+    eligible_filters: List[Any],
+    requested_by: int,
+    company: Any,
+    message: Optional[str],
+) -> List[TruckInspectionRequestRecipient]:
+    """
+    Crea en una sola sentencia (INSERT ... SELECT) una solicitud pendiente para cada
+    trabajador elegible que no tenga ya otra pendiente y devuelve los destinatarios.
+
+    En PostgreSQL el INSERT ... RETURNING va en un CTE unido a users, de modo que los
+    destinatarios con su nombre vuelven en el mismo viaje; en el resto de motores se
+    leen los nombres con una segunda consulta.
+    """
+    has_pending = (
+        select(TruckInspectionRequest.id)
+        .where(
+            TruckInspectionRequest.target_user_id == User.id,
+            TruckInspectionRequest.status == InspectionRequestStatus.PENDING,
+        )
+        .exists()
+    )
+    source = select(
+        literal(requested_by),
+        User.id,
+        literal(company, type_=TruckInspectionRequest.company.type),
+        literal(message, type_=TruckInspectionRequest.message.type),
+        literal(InspectionRequestStatus.PENDING, type_=TruckInspectionRequest.status.type),
+    ).where(*eligible_filters, ~has_pending)
+
+    insert_stmt = (
+        insert(TruckInspectionRequest)
+        .from_select(
+            [
+                TruckInspectionRequest.requested_by,
+                TruckInspectionRequest.target_user_id,
+                TruckInspectionRequest.company,
+                TruckInspectionRequest.message,
+                TruckInspectionRequest.status,
+            ],
+            source,
+        )
+        .returning(TruckInspectionRequest.id, TruckInspectionRequest.target_user_id)
+    )
+
+    if db.get_bind().dialect.name == "postgresql":
+        inserted = insert_stmt.cte("inserted_requests")
+        rows = db.execute(
+            select(inserted.c.id, User.id, User.first_name, User.last_name)
+            .join(User, User.id == inserted.c.target_user_id)
+            .order_by(inserted.c.id)
+        ).all()
+    else:
+        created = dict(db.execute(insert_stmt).tuples().all())
+        names = {}
+        if created:
+            names = {
+                user_id: (first_name, last_name)
+                for user_id, first_name, last_name in db.query(User.id, User.first_name, User.last_name)
+                .filter(User.id.in_(list(created.values())))
+            }
+        rows = [(request_id, user_id, *names.get(user_id, ("", ""))) for request_id, user_id in sorted(created.items())]
+
+    return [
+        TruckInspectionRequestRecipient(
+            request_id=request_id,
+            user_id=user_id,
+            user_name=f"{first_name or ''} {last_name or ''}".strip(),
+        )
+        for request_id, user_id, first_name, last_name in rows
+    ]
+
+
 @router.post('/manual-requests', response_model=TruckInspectionRequestResult, status_code=http_status.HTTP_201_CREATED)
 async def create_manual_inspection_requests(
     payload: TruckInspectionRequestCreate,
@@ -765,76 +982,45 @@ async def create_manual_inspection_requests(
 
     effective_company = effective_company_for_request(current_user, x_company)
 
-    base_query = db.query(User).filter(User.role == UserRole.TRABAJADOR)
-
+    # Trabajadores activos de la empresa efectiva (opcionalmente solo los IDs indicados)
+    eligible_filters = [User.role == UserRole.TRABAJADOR, User.status == UserStatus.ACTIVO]
     if effective_company is not None:
-        base_query = base_query.filter(User.company == effective_company)
+        eligible_filters.append(User.company == effective_company)
+    if not payload.send_to_all:
+        eligible_filters.append(User.id.in_(payload.target_user_ids))
 
+    found_ids: set[int] = set()
     if payload.send_to_all:
-        target_users = base_query.all()
+        eligible_count = db.query(func.count(User.id)).filter(*eligible_filters).scalar() or 0
     else:
-        target_users = base_query.filter(User.id.in_(payload.target_user_ids)).all()
-
-    target_users = [user for user in target_users if getattr(user, "status", None) == UserStatus.ACTIVO]
+        found_ids = {cast(int, user_id) for (user_id,) in db.query(User.id).filter(*eligible_filters)}
+        eligible_count = len(found_ids)
 
-    if not target_users:
+    if not eligible_count:
         raise HTTPException(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             detail="No se encontraron trabajadores válidos para la solicitud",
         )
 
-    target_user_ids = [cast(int, user.id) for user in target_users]
-
-    existing_pending = (
-        db.query(TruckInspectionRequest)
-        .filter(
-            TruckInspectionRequest.target_user_id.in_(target_user_ids),
-            TruckInspectionRequest.status == InspectionRequestStatus.PENDING,
-        )
-        .all()
+    recipients = _insert_manual_inspection_requests(
+        db,
+        eligible_filters,
+        requested_by=cast(int, current_user.id),
+        company=effective_company,
+        message=payload.message,
     )
 
-    pending_ids = {cast(int, pending.target_user_id) for pending in existing_pending}
-    created_entries: List[Tuple[User, TruckInspectionRequest]] = []
-    skipped_existing = 0
-
-    for user in target_users:
-        if user.id in pending_ids:
-            skipped_existing += 1
-            continue
-
-        request = TruckInspectionRequest(
-            requested_by=current_user.id,
-            target_user_id=user.id,
-            company=effective_company,
-            message=payload.message,
-            status=InspectionRequestStatus.PENDING,
-        )
-        db.add(request)
-        created_entries.append((user, request))
-
-    if created_entries:
-        db.flush()
+    created_count = len(recipients)
+    skipped_existing = eligible_count - created_count
 
-    recipients = [
-        TruckInspectionRequestRecipient(
-            request_id=cast(int, request.id),
-            user_id=cast(int, user.id),
-            user_name=user.full_name,
-        )
-        for user, request in created_entries
-    ]
-
-    created_count = len(created_entries)
-
-    if created_entries:
+    if recipients:
         db.commit()
+        invalidate_notification_summary(effective_company)
+        invalidate_inspection_status(recipient.user_id for recipient in recipients)
 
     missing_ids = []
     if not payload.send_to_all:
-        requested_ids = set(payload.target_user_ids)
-        found_ids = {cast(int, user.id) for user in target_users}
-        missing_ids = sorted(requested_ids - found_ids)
+        missing_ids = sorted(set(payload.target_user_ids) - found_ids)
 
     message_parts: list[str] = []
     if created_count:
@@ -927,7 +1113,21 @@ async def create_inspection(
             setattr(request, "completed_at", completion_time)
 
     db.commit()
+    invalidate_notification_summary(current_user.company)
+    invalidate_inspection_status([cast(int, current_user.id)])
     db.refresh(db_inspection)
+    if has_issues:
+        EventBus.publish(
+            EventBus.EVENT_INSPECTION_ISSUE,
+            {
+                "inspection_id": db_inspection.id,
+                "user_id": current_user.id,
+                "user_name": current_user.full_name,
+                "truck_license_plate": db_inspection.truck_license_plate,
+            },
+            company=current_user.company,
+            roles=[UserRole.P_TALLER, UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.TRAFICO],
+        )
     
     # Registrar actividad
     # ActivityService.log_activity(
@@ -999,39 +1199,11 @@ async def get_pending_issues(
             detail="Solo el personal de taller, administradores y tráfico pueden ver incidencias pendientes"
         )
     
-    # Obtener inspecciones con problemas de los últimos 30 días y NO revisadas
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-
-    # Query base: incidencias recientes y no revisadas
-    query = db.query(TruckInspection).options(
-        joinedload(TruckInspection.user)
-    ).filter(
-        and_(
-            TruckInspection.has_issues.is_(True),
-            TruckInspection.inspection_date >= thirty_days_ago,
-            TruckInspection.is_reviewed.is_(False)
-        )
-    )
-
-    # Aplicar filtro por empresa usando el contexto de empresa efectiva
     # Los administradores y administración pueden cambiar de empresa con X-Company
     effective_company = effective_company_for_request(current_user, x_company)
-    
-    if effective_company is not None:
-        # Filtrar por empresa efectiva (incluye inspecciones legacy con company NULL cuyo usuario pertenece a la empresa)
-        query = query.filter(
-            or_(
-                TruckInspection.company == effective_company,
-                and_(
-                    TruckInspection.company.is_(None),
-                    TruckInspection.user.has(User.company == effective_company)
-                )
-            )
-        )
-    elif current_user.role in [UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.P_TALLER]:
-        # Si es admin pero no tiene empresa definida, no mostrar nada por seguridad
-        query = query.filter(TruckInspection.id == 0)  # Fuerza resultado vacío
-    
+    query = _pending_issues_query(db, current_user, effective_company).options(
+        joinedload(TruckInspection.user)
+    )
     inspections = query.order_by(desc(TruckInspection.inspection_date)).all()
 
     return [_build_inspection_summary(inspection) for inspection in inspections]
@@ -1084,6 +1256,7 @@ async def mark_inspection_reviewed(
     setattr(inspection, "revision_notes", revision_notes)
     
     db.commit()
+    invalidate_notification_summary(getattr(inspection, "company", None))
     
     return {
         "message": "Inspección marcada como revisada exitosamente",
@@ -1154,17 +1327,24 @@ async def upload_inspection_image(
         )
     
     try:
-        # Crear directorio si no existe
-        os.makedirs(TRUCK_INSPECTION_FOLDER, exist_ok=True)
-        
         # Generar nombre único para el archivo
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-        filename = f"inspection_{inspection_id}_{component}_{timestamp}{file_extension}"
-        file_path = os.path.join(TRUCK_INSPECTION_FOLDER, filename)
+        base_name = f"inspection_{inspection_id}_{component}_{timestamp}"
         
-        # Guardar archivo
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
+        # Orientación EXIF, sin metadatos, resolución acotada y miniatura (fuera del event loop)
+        try:
+            file_path = await run_in_threadpool(
+                InspectionImageService.save_upload,
+                contents,
+                TRUCK_INSPECTION_FOLDER,
+                base_name,
+                file_extension,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         
         # Actualizar la inspección con la ruta de la imagen
         field_name = f"{component}_image_path"
@@ -1204,6 +1384,8 @@ async def upload_inspection_image(
             message=f"Imagen guardada correctamente para {component}"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1214,12 +1396,20 @@ async def upload_inspection_image(
 @router.get("/stats/", response_model=InspectionStatsResponse)
 async def get_inspection_stats(
     days: int = 30,
+    by_plate: bool = Query(False, description="Incluir totales por matrícula"),
+    by_day: bool = Query(False, description="Incluir totales por día"),
+    plate_limit: int = Query(50, ge=1, le=500, description="Máximo de matrículas en by_plate"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    x_company: Optional[str] = Header(None, alias="X-Company"),
 ):
     """
-    Obtiene estadísticas de inspecciones.
+    Obtiene estadísticas de inspecciones de la empresa efectiva.
     Solo disponible para personal de taller y administradores.
+
+    Los totales y los fallos por componente se calculan en una única consulta
+    agregada (SUM(CASE ...)); los desgloses opcionales por matrícula y por día
+    también se agrupan en SQL, sin cargar las inspecciones en memoria.
     """
     if not _role_in(current_user.role, [UserRole.P_TALLER, UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.TRAFICO]):
         raise HTTPException(
@@ -1229,45 +1419,92 @@ async def get_inspection_stats(
     
     # Filtro de fecha
     since_date = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    # Estadísticas básicas
-    total_query = db.query(TruckInspection).filter(TruckInspection.inspection_date >= since_date)
-    total_inspections = total_query.count()
-    
-    inspections_with_issues = total_query.filter(TruckInspection.has_issues == True).count()
+    filters = [TruckInspection.inspection_date >= since_date]
+
+    # Filtro por empresa (mismo criterio que el listado de inspecciones)
+    effective_company = effective_company_for_request(current_user, x_company)
+    if effective_company is not None:
+        filters.append(_inspection_company_filter(effective_company))
+    elif _role_in(current_user.role, [UserRole.ADMINISTRADOR, UserRole.ADMINISTRACION, UserRole.P_TALLER]):
+        # Si es admin pero no tiene empresa definida, no mostrar nada por seguridad
+        filters.append(TruckInspection.id == 0)
+
+    issue_count = func.coalesce(func.sum(case((TruckInspection.has_issues.is_(True), 1), else_=0)), 0)
+
+    # Totales y fallos por componente en una sola consulta
+    component_counts = [
+        func.coalesce(
+            func.sum(case((and_(TruckInspection.has_issues.is_(True), column.is_(False)), 1), else_=0)), 0
+        )
+        for column, _ in COMPONENT_STATUS_COLUMNS
+    ]
+    row = db.query(func.count(TruckInspection.id), issue_count, *component_counts).filter(*filters).one()
+    total_inspections = int(row[0] or 0)
+    inspections_with_issues = int(row[1] or 0)
     inspections_ok = total_inspections - inspections_with_issues
     
     percentage_with_issues = (inspections_with_issues / total_inspections * 100) if total_inspections > 0 else 0
     
-    # Problemas más comunes
-    most_common_issues = {}
-    problematic_inspections = total_query.filter(TruckInspection.has_issues == True).all()
-    
-    for inspection in problematic_inspections:
-        status_checks = [
-            (cast(Optional[bool], inspection.tires_status), "neumáticos"),
-            (cast(Optional[bool], inspection.brakes_status), "frenos"),
-            (cast(Optional[bool], inspection.lights_status), "luces"),
-            (cast(Optional[bool], inspection.fluids_status), "fluidos"),
-            (cast(Optional[bool], inspection.documentation_status), "documentación"),
-            (cast(Optional[bool], inspection.body_status), "carrocería"),
-        ]
-
-        for status, component_name in status_checks:
-            if status is False:
-                most_common_issues[component_name] = most_common_issues.get(component_name, 0) + 1
+    # Problemas más comunes (solo componentes con fallos, de más a menos frecuentes)
+    failures = [
+        (component_name, int(count or 0))
+        for (_, component_name), count in zip(COMPONENT_STATUS_COLUMNS, row[2:])
+    ]
+    most_common_issues = {
+        component_name: count
+        for component_name, count in sorted(failures, key=lambda item: item[1], reverse=True)
+        if count > 0
+    }
     
     # Inspecciones recientes con problemas
     recent_inspections = db.query(TruckInspection).options(
         joinedload(TruckInspection.user)
     ).filter(
-        and_(
-            TruckInspection.has_issues == True,
-            TruckInspection.inspection_date >= since_date
-        )
+        TruckInspection.has_issues.is_(True),
+        *filters,
     ).order_by(desc(TruckInspection.inspection_date)).limit(10).all()
     
     recent_summaries = [_build_inspection_summary(inspection) for inspection in recent_inspections]
+
+    plate_stats: Optional[List[InspectionPlateStats]] = None
+    if by_plate:
+        plate_rows = (
+            db.query(
+                TruckInspection.truck_license_plate,
+                func.count(TruckInspection.id),
+                issue_count,
+                func.max(TruckInspection.inspection_date),
+            )
+            .filter(*filters)
+            .group_by(TruckInspection.truck_license_plate)
+            .order_by(issue_count.desc(), func.count(TruckInspection.id).desc(), TruckInspection.truck_license_plate)
+            .limit(plate_limit)
+            .all()
+        )
+        plate_stats = [
+            InspectionPlateStats(
+                truck_license_plate=plate,
+                total_inspections=int(total or 0),
+                inspections_with_issues=int(with_issues or 0),
+                last_inspection_date=last_date,
+            )
+            for plate, total, with_issues, last_date in plate_rows
+        ]
+
+    day_stats: Optional[List[InspectionDayStats]] = None
+    if by_day:
+        inspection_day = func.date(TruckInspection.inspection_date)
+        day_rows = (
+            db.query(inspection_day, func.count(TruckInspection.id), issue_count)
+            .filter(*filters)
+            .group_by(inspection_day)
+            .order_by(inspection_day)
+            .all()
+        )
+        day_stats = [
+            InspectionDayStats(date=day, total_inspections=int(total or 0), inspections_with_issues=int(with_issues or 0))
+            for day, total, with_issues in day_rows
+        ]
     
     return InspectionStatsResponse(
         total_inspections=total_inspections,
@@ -1275,13 +1512,21 @@ async def get_inspection_stats(
         inspections_ok=inspections_ok,
         percentage_with_issues=round(percentage_with_issues, 2),
         most_common_issues=most_common_issues,
-        recent_inspections=recent_summaries
+        recent_inspections=recent_summaries,
+        by_plate=plate_stats,
+        by_day=day_stats,
     )
 
 
 @router.get("/image/{image_path:path}")
 async def get_inspection_image(
     image_path: str,
+    request: Request,
+    size: str = Query(
+        InspectionImageService.SIZE_FULL,
+        pattern="^(full|thumb)$",
+        description="full: imagen completa (resolución acotada); thumb: miniatura",
+    ),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1317,10 +1562,15 @@ async def get_inspection_image(
                 detail="Acceso denegado"
             )
         
-        return FileResponse(
-            full_path,
-            media_type="image/jpeg",  # Será ajustado automáticamente por FastAPI según la extensión
-            headers={"Cache-Control": "public, max-age=3600"}  # Cache de 1 hora
+        # La miniatura de fotos antiguas se genera en el primer acceso (fuera del event loop)
+        variant_path = await run_in_threadpool(InspectionImageService.get_variant, abs_file_path, size)
+        
+        # Content-Type inferido por extensión; ETag permite revalidar sin reenviar la imagen
+        return serve_file(
+            request,
+            variant_path,
+            disposition="inline",
+            headers={"Cache-Control": "private, max-age=3600"}  # Cache de 1 hora
         )
         
     except HTTPException:
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Request, BackgroundTasks
 from app.api.auth import get_current_active_user
 from app.models.user import User, UploadHistory
 from app.models.schemas import UploadHistoryItem, UploadHistoryResponse
 from app.database.connection import get_db
 from app.config import settings
+from app.utils.file_delivery import serve_file
+from app.utils.zip_stream import zip_streaming_response
+from app.services.pdf_thumbnail_service import PdfThumbnailService, serve_pdf_thumbnail
 from sqlalchemy.orm import Session
-from typing import List, Optional, cast
+from typing import List, Optional, Tuple, cast
 import os
+import re
 from pathlib import Path
 from datetime import datetime
 
@@ -82,6 +85,7 @@ async def download_file(
     dni_nie: str,
     folder_type: str,
     filename: str,
+    request: Request,
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -108,16 +112,100 @@ async def download_file(
     if not file_path.is_file():
         raise HTTPException(status_code=400, detail="La ruta no corresponde a un archivo")
     
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type='application/octet-stream',
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    return serve_file(request, file_path, filename=filename, media_type='application/octet-stream')
+
+_SPANISH_MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+_MONTH_NAME_RE = re.compile(r"(?<![a-z])(" + "|".join(_SPANISH_MONTHS) + r")[_\-\s]*(\d{4})", re.IGNORECASE)
+_ISO_MONTH_RE = re.compile(r"(?<!\d)(\d{4})[-_](\d{2})(?!\d)")
+
+
+def _parse_month(value: Optional[str], field: str) -> Optional[Tuple[int, int]]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Formato de {field} inválido (use YYYY-MM)")
+    return parsed.year, parsed.month
+
+
+def _document_month(file_path: Path) -> Tuple[int, int]:
+    """
+    Mes (año, mes) al que corresponde un documento.
+    Se toma del nombre generado al procesar (p. ej. nomina_junio_2025_... o 2025-06);
+    si no aparece, se usa la fecha de modificación del archivo.
+    """
+    name = file_path.stem
+    match = _MONTH_NAME_RE.search(name)
+    if match:
+        return int(match.group(2)), _SPANISH_MONTHS[match.group(1).lower()]
+    match = _ISO_MONTH_RE.search(name)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return int(match.group(1)), int(match.group(2))
+    modified = datetime.fromtimestamp(file_path.stat().st_mtime)
+    return modified.year, modified.month
+
+
+@router.get("/export/{dni_nie}")
+async def export_user_documents(
+    dni_nie: str,
+    folder_type: Optional[str] = Query(None, description="nominas o dietas (por defecto ambas)"),
+    from_month: Optional[str] = Query(None, description="Mes inicial incluido (YYYY-MM)"),
+    to_month: Optional[str] = Query(None, description="Mes final incluido (YYYY-MM)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Descarga en un ZIP las nóminas y/o dietas de un usuario, opcionalmente
+    filtradas por rango de meses. El ZIP se genera en streaming.
+    Solo permite exportar archivos del propio usuario o si es admin.
+    """
+    user_role = current_user.role.value if hasattr(current_user.role, 'value') else str(current_user.role)
+    if user_role not in ("ADMINISTRADOR", "MASTER_ADMIN") and cast(str, current_user.dni_nie) != dni_nie:
+        raise HTTPException(status_code=403, detail="No tienes permisos para acceder a estos archivos")
+
+    valid_folders = ["nominas", "dietas"]
+    if folder_type is not None and folder_type not in valid_folders:
+        raise HTTPException(status_code=400, detail="Solo se permiten carpetas de nóminas y dietas")
+    folders = [folder_type] if folder_type else valid_folders
+
+    start = _parse_month(from_month, "from_month")
+    end = _parse_month(to_month, "to_month")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="from_month no puede ser posterior a to_month")
+
+    user_base_path = Path(settings.user_files_base_path) / dni_nie
+    if Path(dni_nie).name != dni_nie or not user_base_path.is_dir():
+        raise HTTPException(status_code=404, detail="No hay documentos para este usuario")
+
+    # El listado es barato (solo metadatos); la lectura de contenido ocurre al enviar
+    entries: List[Tuple[Path, str]] = []
+    for folder in folders:
+        folder_path = user_base_path / folder
+        if not folder_path.is_dir():
+            continue
+        for file_path in sorted(folder_path.iterdir()):
+            if not file_path.is_file() or file_path.name.lower() in {"thumbs.db", "desktop.ini"}:
+                continue
+            if start or end:
+                month = _document_month(file_path)
+                if (start and month < start) or (end and month > end):
+                    continue
+            entries.append((file_path, f"{folder}/{file_path.name}"))
+
+    if not entries:
+        raise HTTPException(status_code=404, detail="No hay documentos que coincidan con el filtro")
+
+    suffix = "_".join(part for part in (folder_type, from_month, to_month) if part)
+    zip_name = f"{dni_nie}_{suffix}.zip" if suffix else f"{dni_nie}_documentos.zip"
+    return zip_streaming_response(entries, zip_name)
 
 @router.post("/upload/{folder_type}")
 async def upload_file(
     folder_type: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -164,6 +252,9 @@ async def upload_file(
         with open(str(file_path), "wb") as f:
             f.write(content)
         
+        # Precalcular la miniatura para que el listado no espere al renderizado
+        background_tasks.add_task(PdfThumbnailService.warm_up, file_path)
+        
         file_stat = file_path.stat()
         
         return {
@@ -301,11 +392,14 @@ async def preview_file(
     dni_nie: str,
     folder_type: str,
     filename: str,
-    token: Optional[str] = None
+    request: Request,
+    token: Optional[str] = None,
+    thumbnail: bool = Query(False, description="Devolver solo la miniatura de la primera página")
 ):
     """
     Vista previa de archivos PDF con autenticación por token en query parameter.
     Específicamente diseñado para funcionar con iframes.
+    Con thumbnail=true devuelve una imagen pequeña de la primera página.
     """
     from app.api.auth import get_current_user
     from app.database.connection import get_db
@@ -345,16 +439,16 @@ async def preview_file(
         if not file_path.is_file():
             raise HTTPException(status_code=400, detail="La ruta no corresponde a un archivo")
         
+        if thumbnail:
+            return await serve_pdf_thumbnail(request, file_path)
+        
         # Retornar el archivo con Content-Type específico para PDF
-        return FileResponse(
-            path=str(file_path),
-            filename=filename,
-            media_type='application/pdf',
-            headers={"Content-Disposition": "inline"}
-        )
+        return serve_file(request, file_path, media_type='application/pdf', disposition="inline")
         
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al procesar la solicitud: {str(e)}")
     finally:
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
@@ -8,6 +8,8 @@ from app.models.user import User, UserRole, UserStatus
 from app.api.auth import get_current_user
 from app.utils.company_context import effective_company_for_request
 from app.models.company_enum import Company
+from app.services.event_bus import EventBus
+from app.utils.conditional_request import list_etag, not_modified, query_version, set_etag
 from app.models.user_schemas import (
     UserCreate, UserUpdate, UserResponse, UserList, 
     UserListResponse, PasswordChange, AdminPasswordReset
@@ -16,6 +18,17 @@ import math
 
 router = APIRouter()
 
+
+def _publish_user_status(user: User) -> None:
+    """Avisa por SSE a los administradores de la empresa y al propio usuario."""
+    EventBus.publish(
+        EventBus.EVENT_USER_STATUS,
+        {"user_id": user.id, "status": getattr(user.status, "value", user.status)},
+        company=user.company,
+        roles=["ADMINISTRADOR", "MASTER_ADMIN"],
+        user_ids=[user.id],
+    )
+
 @router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user_data: UserCreate,
@@ -50,6 +63,8 @@ async def create_user(
 
 @router.get("/users", response_model=UserListResponse)
 async def get_users(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(10, ge=1, le=100, description="Usuarios por página"),
     search: Optional[str] = Query(None, description="Buscar por DNI, email o nombre"),
@@ -65,6 +80,7 @@ async def get_users(
     Obtener lista de usuarios con paginación y filtros.
     - active_only: incluye usuarios ACTIVOS y BAJA (pueden hacer login)
     - available_drivers_only: solo usuarios ACTIVOS con rol TRABAJADOR (conductores disponibles)
+    Admite If-None-Match: si el conjunto filtrado no ha cambiado responde 304.
     """
     skip = (page - 1) * per_page
 
@@ -103,8 +119,13 @@ async def get_users(
     
     # Si no se especifica ningún filtro, mostrar todos (incluyendo INACTIVOS)
 
-    # Total antes de paginar
-    total_users = query.count()
+    # Sello de versión (incluye el total antes de paginar) y respuesta condicional
+    total_users, last_update, last_id = query_version(query, User.id, User.updated_at)
+    etag = list_etag(request, getattr(company, "value", company), total_users, last_update, last_id)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
     total_pages = math.ceil(total_users / per_page) if per_page else 1
 
     # Orden estable y paginación
@@ -269,6 +290,7 @@ async def set_user_status(
         user.set_status(new_status)
         db.commit()
         db.refresh(user)
+        _publish_user_status(user)
         
         # Retornar usuario actualizado
         return user
@@ -314,6 +336,7 @@ async def toggle_user_status(
     # Usar el método del modelo para cambiar el estado
     user.set_status(new_status)
     db.commit()
+    _publish_user_status(user)
     
     # Retornar usuario actualizado
     updated_user = UserService.get_user_by_id(db, user_id)
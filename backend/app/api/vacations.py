@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
 from fastapi import status as http_status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import extract
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import IntegrityError
 from app.database.connection import get_db
 from app.models.user import User
 from app.models.vacation import VacationRequest, VacationStatus, AbsenceType as ModelAbsenceType
@@ -18,11 +19,59 @@ from datetime import datetime, date
 from typing import List, Optional, Any, cast
 import calendar
 from app.utils.company_context import effective_company_for_request
+from app.services.vacation_usage_service import VacationUsageService
+from app.services.vacation_overlap_service import VacationOverlapService
+from app.services.vacation_cache import cache_key, invalidate_vacation_caches, vacation_stats_cache
+from app.services.vacation_pending_counter import VacationPendingCounter
+from app.services.event_bus import EventBus
+from app.utils.file_delivery import is_not_modified
+from app.utils.conditional_request import list_etag, not_modified, query_version, set_etag
 
 router = APIRouter()
 
+
+def _year_range_filter(year: int):
+    """
+    Filtro por año de inicio como rango semiabierto [1 ene, 1 ene siguiente).
+    A diferencia de extract('year', ...) permite usar los índices sobre start_date.
+    """
+    return (
+        VacationRequest.start_date >= datetime(year, 1, 1),
+        VacationRequest.start_date < datetime(year + 1, 1, 1),
+    )
+
+
+def _publish_vacation_event(event_type: str, request_id: Any, user_id: Any, company: Any, status: Any) -> None:
+    """Notifica el cambio a los administradores de la empresa y al propietario de la solicitud."""
+    EventBus.publish(
+        event_type,
+        {"request_id": request_id, "user_id": user_id, "status": getattr(status, "value", status)},
+        company=company,
+        roles=["ADMINISTRADOR", "MASTER_ADMIN"],
+        user_ids=[user_id],
+    )
+
+
+def _commit_checking_overlap(db: Session) -> None:
+    """
+    Commit que traduce la violación de la restricción de exclusión de PostgreSQL
+    (dos ausencias aprobadas solapadas del mismo usuario) en un error 400.
+    """
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if VacationOverlapService.is_overlap_violation(e):
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail="Ya existe una ausencia aprobada para este usuario en ese período"
+            )
+        raise
+
 @router.get("/", response_model=List[VacationRequestResponse])
 async def get_vacation_requests(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
     user_id: Optional[int] = None,
     year: Optional[int] = None,
@@ -34,11 +83,9 @@ async def get_vacation_requests(
     Obtiene solicitudes de vacaciones con filtros opcionales.
     Los usuarios regulares solo pueden ver sus propias solicitudes.
     Los administradores pueden ver todas las solicitudes.
+    Admite If-None-Match: si las solicitudes filtradas no han cambiado responde 304.
     """
-    query = db.query(VacationRequest).options(
-        joinedload(VacationRequest.user),
-        joinedload(VacationRequest.reviewer)
-    )
+    query = db.query(VacationRequest)
     # Filtro por empresa del usuario actual
     comp_obj = effective_company_for_request(current_user, x_company)
     if comp_obj is not None:
@@ -64,15 +111,28 @@ async def get_vacation_requests(
     
     # Filtro por año
     if year:
-        query = query.filter(
-            extract('year', VacationRequest.start_date) == year
-        )
-    
+        query = query.filter(*_year_range_filter(year))
+    
+    # Respuesta condicional a partir del sello de versión del conjunto filtrado
+    etag = list_etag(
+        request,
+        getattr(comp_obj, "value", comp_obj),
+        current_user.id,
+        *query_version(query, VacationRequest.id, VacationRequest.updated_at),
+    )
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+
     # Ordenar por fecha de creación descendente
-    requests = query.order_by(VacationRequest.created_at.desc()).all()
+    requests = query.options(
+        joinedload(VacationRequest.user),
+        joinedload(VacationRequest.reviewer)
+    ).order_by(VacationRequest.created_at.desc()).all()
     
     # Formatear respuesta con datos adicionales
-    response = []
+    results = []
     for req in requests:
         req_dict = {
             "id": req.id,
@@ -91,9 +151,9 @@ async def get_vacation_requests(
             "employee_name": req.user.full_name if req.user else None,
             "reviewer_name": req.reviewer.full_name if req.reviewer else None
         }
-        response.append(VacationRequestResponse(**req_dict))
+        results.append(VacationRequestResponse(**req_dict))
     
-    return response
+    return results
 
 @router.post("/", response_model=VacationRequestResponse)
 async def create_vacation_request(
@@ -122,12 +182,15 @@ async def create_vacation_request(
         )
     
     # Verificar si ya existe una solicitud en las mismas fechas
-    overlapping = db.query(VacationRequest).filter(
-        VacationRequest.user_id == current_user.id,
-        VacationRequest.status.in_([VacationStatus.PENDING, VacationStatus.APPROVED]),
-        VacationRequest.start_date <= request.end_date,
-        VacationRequest.end_date >= request.start_date
-    ).first()
+    # (bloqueando al usuario para que dos envíos simultáneos no pasen ambos la comprobación)
+    VacationOverlapService.lock_user(db, current_user.id)
+    overlapping = VacationOverlapService.find_overlapping(
+        db,
+        current_user.id,
+        request.start_date,
+        request.end_date,
+        [VacationStatus.PENDING, VacationStatus.APPROVED],
+    )
     
     if overlapping:
         raise HTTPException(
@@ -150,8 +213,13 @@ async def create_vacation_request(
     )
     
     db.add(db_request)
-    db.commit()
+    _commit_checking_overlap(db)
     db.refresh(db_request)
+    invalidate_vacation_caches(db_request.company)
+    VacationPendingCounter.record_change(None, (db_request.company, db_request.status))
+    _publish_vacation_event(
+        EventBus.EVENT_VACATION_CREATED, db_request.id, db_request.user_id, db_request.company, db_request.status
+    )
 
     # Log actividad
     try:
@@ -273,11 +341,17 @@ async def update_vacation_request(
         except Exception:
             pass
     
+    previous_state = (db_request.company, db_request.status)
     for field, value in update_data.items():
         setattr(db_request, field, value)
     
-    db.commit()
+    _commit_checking_overlap(db)
     db.refresh(db_request)
+    invalidate_vacation_caches(db_request.company)
+    VacationPendingCounter.record_change(previous_state, (db_request.company, db_request.status))
+    _publish_vacation_event(
+        EventBus.EVENT_VACATION_UPDATED, db_request.id, db_request.user_id, db_request.company, db_request.status
+    )
 
     # Log actualización
     try:
@@ -375,8 +449,15 @@ async def delete_vacation_request(
             detail="Solo se pueden eliminar solicitudes pendientes"
         )
     
+    request_company = db_request.company
+    previous_state = (request_company, db_request.status)
     db.delete(db_request)
     db.commit()
+    invalidate_vacation_caches(request_company)
+    VacationPendingCounter.record_change(previous_state, None)
+    _publish_vacation_event(
+        EventBus.EVENT_VACATION_DELETED, request_id, db_request.user_id, request_company, previous_state[1]
+    )
     try:
         msg = "Eliminó su solicitud de vacaciones" if is_owner else f"Eliminó solicitud de vacaciones de {db_request.user.full_name if db_request and db_request.user else 'usuario'}"
         ActivityService.log_from_user(
@@ -443,6 +524,7 @@ async def update_vacation_status(
     
     # Actualizar el estado
     dbr: Any = db_request
+    previous_state = (dbr.company, dbr.status)
     dbr.status = vacation_status
     dbr.reviewed_by = current_user.id
     dbr.reviewed_at = datetime.now()
@@ -450,7 +532,10 @@ async def update_vacation_status(
     if admin_response:
         dbr.admin_response = admin_response
     
-    db.commit()
+    _commit_checking_overlap(db)
+    invalidate_vacation_caches(dbr.company)
+    VacationPendingCounter.record_change(previous_state, (dbr.company, dbr.status))
+    _publish_vacation_event(EventBus.EVENT_VACATION_STATUS, dbr.id, dbr.user_id, dbr.company, dbr.status)
     try:
         # Obtener nombre del solicitante para mensaje amigable
         owner_user = db.query(User).filter(User.id == dbr.user_id).first()
@@ -486,44 +571,55 @@ async def get_vacation_stats(
     """
     Obtiene estadísticas de las solicitudes de vacaciones.
     Los usuarios ven solo sus estadísticas, los admins ven todas.
+    Se cachean brevemente por (empresa, usuario, año) y se invalidan con cada cambio.
     """
     
     current_year = year or datetime.now().year
     
-    # Base query
-    query = db.query(VacationRequest)
-    # Filtrar por empresa
     comp_obj = effective_company_for_request(current_user, x_company)
-    if comp_obj is not None:
-        query = query.filter(VacationRequest.company == comp_obj)
-    
     # Si no es admin pleno, solo sus propias solicitudes
+    scope_user_id = None
     if current_user.role.value not in ['ADMINISTRADOR', 'MASTER_ADMIN']:
-        query = query.filter(VacationRequest.user_id == current_user.id)
-    
-    # Todas las solicitudes
-    total_requests = query.count()
-    pending = query.filter(VacationRequest.status == VacationStatus.PENDING).count()
-    approved = query.filter(VacationRequest.status == VacationStatus.APPROVED).count()
-    rejected = query.filter(VacationRequest.status == VacationStatus.REJECTED).count()
-    
-    # Solicitudes del año actual
-    current_year_query = query.filter(
-        extract('year', VacationRequest.start_date) == current_year
+        scope_user_id = current_user.id
+    
+    key = cache_key(comp_obj, scope_user_id, current_year)
+    cached = vacation_stats_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Todos los contadores en una sola pasada con agregación condicional
+    in_year = and_(*_year_range_filter(current_year))
+    status_col = VacationRequest.status
+    
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+    
+    query = db.query(
+        func.count(VacationRequest.id),
+        count_if(status_col == VacationStatus.PENDING),
+        count_if(status_col == VacationStatus.APPROVED),
+        count_if(status_col == VacationStatus.REJECTED),
+        count_if(in_year),
+        count_if(and_(in_year, status_col == VacationStatus.APPROVED)),
     )
-    current_year_total = current_year_query.count()
-    current_year_approved = current_year_query.filter(
-        VacationRequest.status == VacationStatus.APPROVED
-    ).count()
-    
-    return VacationStats(
-        total_requests=total_requests,
-        pending=pending,
-        approved=approved,
-        rejected=rejected,
-        current_year_total=current_year_total,
-        current_year_approved=current_year_approved
+    # Filtrar por empresa
+    if comp_obj is not None:
+        query = query.filter(VacationRequest.company == comp_obj)
+    if scope_user_id is not None:
+        query = query.filter(VacationRequest.user_id == scope_user_id)
+    
+    total_requests, pending, approved, rejected, current_year_total, current_year_approved = query.one()
+    
+    stats = VacationStats(
+        total_requests=int(total_requests),
+        pending=int(pending),
+        approved=int(approved),
+        rejected=int(rejected),
+        current_year_total=int(current_year_total),
+        current_year_approved=int(current_year_approved)
     )
+    vacation_stats_cache.set(key, stats)
+    return stats
 
 @router.get("/pending-for-admin", response_model=List[VacationRequestResponse])
 async def get_pending_requests_for_admin(
@@ -578,6 +674,8 @@ async def get_pending_requests_for_admin(
 
 @router.get("/pending/count")
 async def get_pending_count(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     x_company: str | None = Header(default=None, alias="X-Company")
@@ -585,22 +683,25 @@ async def get_pending_count(
     """
     Obtiene el conteo de solicitudes de vacaciones pendientes para el sidebar.
     Solo accesible para administradores.
+
+    El valor sale del contador en memoria (VacationPendingCounter) y se devuelve
+    con un ETag: si el cliente envía If-None-Match y no ha cambiado, responde 304.
     """
     # Verificar permisos de administrador
     if current_user.role.value not in ['ADMINISTRADOR', 'MASTER_ADMIN']:
-        return {"count": 0}
-    
-    # Contar solicitudes pendientes
-    query = db.query(VacationRequest).filter(
-        VacationRequest.status == VacationStatus.PENDING
-    )
-    
-    # Filtro por empresa del usuario actual
-    comp_obj = effective_company_for_request(current_user, x_company)
-    if comp_obj is not None:
-        query = query.filter(VacationRequest.company == comp_obj)
-    
-    count = query.count()
+        count = 0
+        scope = "none"
+    else:
+        # Filtro por empresa del usuario actual
+        comp_obj = effective_company_for_request(current_user, x_company)
+        count = VacationPendingCounter.get(db, comp_obj)
+        scope = getattr(comp_obj, "value", None) or "all"
+
+    etag = f'W/"pending-{scope}-{count}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return {"count": count}
 
 @router.get("/usage", response_model=VacationUsage)
@@ -637,40 +738,21 @@ async def get_vacation_usage(
             raise HTTPException(status_code=http_status.HTTP_403_FORBIDDEN, detail="No autorizado")
         target_user_id_val = base_user_id_int
 
-    # Query base para el año
-    q = db.query(VacationRequest).filter(
-        VacationRequest.user_id == target_user_id_val,
-        extract('year', VacationRequest.start_date) == target_year
-    )
     comp_obj = effective_company_for_request(current_user, x_company)
-    if comp_obj is not None:
-        q = q.filter(VacationRequest.company == comp_obj)
 
     # Filtro opcional por tipo de ausencia
     at = None
     if absence_type:
         try:
             at = ModelAbsenceType(absence_type)
-            q = q.filter(VacationRequest.absence_type == at)
         except ValueError:
             raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="absence_type no válido")
 
-    # Sumar días aprobados y pendientes
-    approved_requests = q.filter(VacationRequest.status == VacationStatus.APPROVED).all()
-    pending_q = db.query(VacationRequest).filter(
-        VacationRequest.user_id == target_user_id_val,
-        extract('year', VacationRequest.start_date) == target_year,
-        VacationRequest.status == VacationStatus.PENDING
+    # Sumar días aprobados y pendientes en la base de datos (una sola consulta)
+    usage = VacationUsageService.get_usage_by_user(
+        db, [target_user_id_val], target_year, company=comp_obj, absence_type=at
     )
-    # Restringir por empresa también en pendientes
-    if comp_obj is not None:
-        pending_q = pending_q.filter(VacationRequest.company == comp_obj)
-    if absence_type and at is not None:
-        pending_q = pending_q.filter(VacationRequest.absence_type == at)
-    pending_requests = pending_q.all()
-
-    approved_days_used = sum(req.duration_days for req in approved_requests)
-    pending_days_requested = sum(req.duration_days for req in pending_requests)
+    approved_days_used, pending_days_requested = usage[target_user_id_val]
 
     return VacationUsage(
         user_id=target_user_id_val,
@@ -680,6 +762,45 @@ async def get_vacation_usage(
     )
 
 
+@router.get("/usage/batch", response_model=List[VacationUsage])
+async def get_vacation_usage_batch(
+    user_ids: List[int] = Query(..., description="IDs de usuario (repetible: ?user_ids=1&user_ids=2)"),
+    year: int | None = None,
+    absence_type: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    x_company: str | None = Header(default=None, alias="X-Company")
+):
+    """
+    Uso anual de días para varios usuarios en una sola consulta (pantalla de
+    aprobación de solicitudes pendientes). Solo para administradores.
+    """
+    if current_user.role.value not in ['ADMINISTRADOR', 'MASTER_ADMIN']:
+        raise HTTPException(status_code=http_status.HTTP_403_FORBIDDEN, detail="No autorizado")
+    if len(user_ids) > 500:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="Máximo 500 usuarios por consulta")
+
+    target_year = year or datetime.now().year
+    at = None
+    if absence_type:
+        try:
+            at = ModelAbsenceType(absence_type)
+        except ValueError:
+            raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="absence_type no válido")
+
+    comp_obj = effective_company_for_request(current_user, x_company)
+    usage = VacationUsageService.get_usage_by_user(db, user_ids, target_year, company=comp_obj, absence_type=at)
+    return [
+        VacationUsage(
+            user_id=uid,
+            year=target_year,
+            approved_days_used=approved,
+            pending_days_requested=pending,
+        )
+        for uid, (approved, pending) in usage.items()
+    ]
+
+
 @router.post("/admin/create", response_model=VacationRequestResponse)
 async def create_vacation_for_user(
     user_id: int,
@@ -716,12 +837,14 @@ async def create_vacation_for_user(
         )
     
     # Verificar si ya existe una solicitud aprobada en las mismas fechas para el usuario
-    overlapping = db.query(VacationRequest).filter(
-        VacationRequest.user_id == user_id,
-        VacationRequest.status == VacationStatus.APPROVED,
-        VacationRequest.start_date <= request.end_date,
-        VacationRequest.end_date >= request.start_date
-    ).first()
+    VacationOverlapService.lock_user(db, user_id)
+    overlapping = VacationOverlapService.find_overlapping(
+        db,
+        user_id,
+        request.start_date,
+        request.end_date,
+        [VacationStatus.APPROVED],
+    )
     
     if overlapping:
         raise HTTPException(
@@ -746,8 +869,13 @@ async def create_vacation_for_user(
     )
     
     db.add(db_request)
-    db.commit()
+    _commit_checking_overlap(db)
     db.refresh(db_request)
+    invalidate_vacation_caches(db_request.company)
+    VacationPendingCounter.record_change(None, (db_request.company, db_request.status))
+    _publish_vacation_event(
+        EventBus.EVENT_VACATION_CREATED, db_request.id, db_request.user_id, db_request.company, db_request.status
+    )
 
     # Log actividad
     try:
@@ -38,8 +38,51 @@ class Settings(BaseSettings):
     payroll_files_base_path: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "files", "payroll"))
     orders_files_base_path: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "files", "orders"))
     upload_max_size: int = 10485760  # 10MB
+    # Archivos que se escriben a la vez en las subidas múltiples de Tráfico
+    traffic_upload_concurrency: int = int(os.getenv("TRAFFIC_UPLOAD_CONCURRENCY", "4"))
     allowed_extensions: List[str] = [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".jpg", ".jpeg", ".png"]
-    
+
+    # Entrega de archivos: "" (directa desde Python), "x-accel-redirect" (nginx) o "x-sendfile" (Apache/lighttpd)
+    file_delivery_mode: str = os.getenv("FILE_DELIVERY_MODE", "")
+    # Prefijo de las locations internas de nginx (solo para x-accel-redirect): cada raíz
+    # de almacenamiento tiene la suya, ver app/utils/file_delivery.py
+    file_delivery_internal_prefix: str = os.getenv("FILE_DELIVERY_INTERNAL_PREFIX", "/internal-files")
+
+    # Miniaturas de PDFs (primera página): caché en disco, resolución y formato ("png" o "jpeg")
+    thumbnails_cache_path: str = os.getenv("THUMBNAILS_CACHE_PATH", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "files", "cache", "thumbnails")))
+    thumbnail_dpi: int = int(os.getenv("THUMBNAIL_DPI", "40"))
+    thumbnail_format: str = os.getenv("THUMBNAIL_FORMAT", "png")
+
+    # Fotos de inspecciones de camiones: lado máximo de la imagen guardada y de su
+    # miniatura (px), formato ("webp" o "jpeg") y calidad de compresión (requiere Pillow)
+    inspection_image_max_px: int = int(os.getenv("INSPECTION_IMAGE_MAX_PX", "1600"))
+    inspection_image_thumb_px: int = int(os.getenv("INSPECTION_IMAGE_THUMB_PX", "320"))
+    inspection_image_format: str = os.getenv("INSPECTION_IMAGE_FORMAT", "webp")
+    inspection_image_quality: int = int(os.getenv("INSPECTION_IMAGE_QUALITY", "80"))
+
+    # Índice de búsqueda de Tráfico: reconstrucción completa periódica (0 = solo incremental)
+    traffic_search_reindex_seconds: int = int(os.getenv("TRAFFIC_SEARCH_REINDEX_SECONDS", "600"))
+
+    # Contador en memoria de vacaciones pendientes: recuento completo periódico para
+    # corregir la deriva entre workers (cada proceso solo ve sus propios cambios)
+    vacation_pending_resync_seconds: int = int(os.getenv("VACATION_PENDING_RESYNC_SECONDS", "120"))
+
+    # Configuración de inspecciones automáticas de camiones. Con varios workers (o
+    # varias máquinas) debe apuntar a una ruta compartida: se relee al cambiar su mtime
+    auto_inspection_settings_file: str = os.getenv("AUTO_INSPECTION_SETTINGS_FILE", "truck_inspection_settings.json")
+
+    # Estado (punto de control) de la reparación masiva de carpetas. Vacío o relativo:
+    # se resuelve dentro de files_base_path, compartido por todos los workers
+    folder_repair_state_file: str = os.getenv("FOLDER_REPAIR_STATE_FILE", "")
+
+    # Caché por proceso del estado de /check-needed: TTL corto porque la invalidación
+    # solo llega al worker que atendió el cambio
+    inspection_status_cache_seconds: int = int(os.getenv("INSPECTION_STATUS_CACHE_SECONDS", "5"))
+
+    # Stream de eventos (SSE): latido para mantener viva la conexión y cola por cliente
+    events_heartbeat_seconds: int = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "25"))
+    events_queue_size: int = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
     # App
     app_name: str = "Portal SGT"
     app_version: str = "1.0.0"
@@ -69,10 +112,18 @@ class Settings(BaseSettings):
 # Instancia global de configuración
 settings = Settings()
 
-# Crear directorios base para la estructura unificada si no existen
-os.makedirs(settings.files_base_path, exist_ok=True)
-os.makedirs(settings.user_files_base_path, exist_ok=True)
-os.makedirs(settings.traffic_files_base_path, exist_ok=True)
-os.makedirs(settings.documents_files_base_path, exist_ok=True)
-os.makedirs(settings.payroll_files_base_path, exist_ok=True)
-os.makedirs(settings.orders_files_base_path, exist_ok=True)
+
+def ensure_storage_directories() -> None:
+    """
+    Crea los directorios base para la estructura unificada si no existen.
+    Se invoca desde el arranque de la aplicación (lifespan), no al importar el módulo.
+    """
+    for path in (
+        settings.files_base_path,
+        settings.user_files_base_path,
+        settings.traffic_files_base_path,
+        settings.documents_files_base_path,
+        settings.payroll_files_base_path,
+        settings.orders_files_base_path,
+    ):
+        os.makedirs(path, exist_ok=True)
@@ -5,7 +5,7 @@ Estas órdenes permiten registrar incidencias inmediatas sobre un vehículo sin
 from __future__ import annotations
 
 import enum
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, func, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, func, Boolean, Index, text
 from sqlalchemy.orm import relationship
 
 from app.database.connection import Base
@@ -19,6 +19,11 @@ class VehicleKind(enum.Enum):
 
 class DirectInspectionOrder(Base):
     __tablename__ = "direct_inspection_orders"
+    __table_args__ = (
+        # Paginación por cursor sobre (created_at, id) (ver migración f5b2d8c31a64)
+        Index("idx_direct_inspection_orders_company_created_id", "company", text("created_at DESC"), text("id DESC")),
+        Index("idx_direct_inspection_orders_created_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     truck_license_plate = Column(String(16), nullable=False, index=True)
@@ -1,5 +1,5 @@
 """Modelo para inspecciones de camiones."""
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, func, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, func, Enum, Index, text
 from sqlalchemy.orm import relationship
 from app.database.connection import Base
 from app.models.company_enum import Company
@@ -12,6 +12,18 @@ class TruckInspection(Base):
     Incluye 6 componentes: neumáticos, frenos, luces, fluidos, documentación y carrocería.
     """
     __tablename__ = 'truck_inspections'
+    __table_args__ = (
+        # Consultas frecuentes (ver migración e3a91f5c7b20; el índice trigram de
+        # truck_license_plate solo existe en PostgreSQL y se crea en la migración)
+        Index(
+            "idx_truck_inspections_unreviewed_issues",
+            "company",
+            text("inspection_date DESC"),
+            postgresql_where=text("has_issues AND NOT is_reviewed"),
+            sqlite_where=text("has_issues AND NOT is_reviewed"),
+        ),
+        Index("idx_truck_inspections_user_date", "user_id", text("inspection_date DESC")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database.connection import Base
@@ -22,6 +22,11 @@ class VacationRequest(Base):
     Relacionado con la tabla de usuarios.
     """
     __tablename__ = "vacation_requests"
+    __table_args__ = (
+        # Filtros por empresa/estado y rango de fechas (ver migración b7e21c4d9a10)
+        Index("idx_vacation_requests_company_status_start", "company", "status", "start_date"),
+        Index("idx_vacation_requests_user_start", "user_id", "start_date"),
+    )
     
     # Identificador
     id = Column(Integer, primary_key=True, index=True)
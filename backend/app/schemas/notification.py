@@ -0,0 +1,12 @@
+"""Esquemas Pydantic para el resumen de avisos (badges) de la interfaz."""
+from pydantic import BaseModel, Field
+
+
+class NotificationSummary(BaseModel):
+    """Contadores de avisos del usuario actual; los que no aplican a su rol valen 0/False."""
+
+    vacations_pending: int = Field(0, description="Solicitudes de vacaciones pendientes (administradores)")
+    inspection_issues_pending: int = Field(0, description="Inspecciones con incidencias sin revisar (últimos 30 días)")
+    direct_orders_pending: int = Field(0, description="Órdenes directas de taller sin revisar")
+    inspection_needed: bool = Field(False, description="El trabajador debe realizar una inspección")
+    inspection_manual_requests: int = Field(0, description="Solicitudes manuales de inspección pendientes del trabajador")
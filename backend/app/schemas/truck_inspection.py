@@ -1,5 +1,5 @@
 """Esquemas Pydantic para inspecciones de camiones."""
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field, validator
 
@@ -159,6 +159,21 @@ class InspectionNeededResponse(BaseModel):
     auto_inspection_enabled: bool = True
 
 
+class InspectionPlateStats(BaseModel):
+    """Totales de inspecciones de una matrícula en el periodo."""
+    truck_license_plate: str
+    total_inspections: int
+    inspections_with_issues: int
+    last_inspection_date: Optional[datetime] = None
+
+
+class InspectionDayStats(BaseModel):
+    """Totales de inspecciones de un día del periodo."""
+    date: date
+    total_inspections: int
+    inspections_with_issues: int
+
+
 class InspectionStatsResponse(BaseModel):
     """Estadísticas de inspecciones."""
     total_inspections: int
@@ -167,6 +182,8 @@ class InspectionStatsResponse(BaseModel):
     percentage_with_issues: float
     most_common_issues: Dict[str, int]
     recent_inspections: list[TruckInspectionSummary]
+    by_plate: Optional[List[InspectionPlateStats]] = None
+    by_day: Optional[List[InspectionDayStats]] = None
 
 
 class ImageUploadResponse(BaseModel):
@@ -2,6 +2,7 @@ from typing import Optional, Any, Dict
 from sqlalchemy.orm import Session
 from app.models.activity_log import ActivityLog
 from app.models.company_enum import Company
+from app.services.event_bus import EventBus
 
 
 class ActivityService:
@@ -79,6 +80,20 @@ class ActivityService:
             if auto_commit:
                 db.commit()
                 db.refresh(entry)
+                # Los administradores ven toda la actividad; el resto solo la propia
+                EventBus.publish(
+                    EventBus.EVENT_ACTIVITY,
+                    {
+                        "id": entry.id,
+                        "event_type": event_type,
+                        "message": entry.message,
+                        "actor_name": actor_name,
+                        "created_at": entry.created_at,
+                    },
+                    company=company_val,
+                    roles=["ADMINISTRADOR", "MASTER_ADMIN"],
+                    user_ids=[actor_id],
+                )
             return entry
         except Exception:
             if auto_commit:
@@ -0,0 +1,164 @@
+"""
+Publicación/suscripción en memoria para el stream de eventos (SSE).
+
+Los endpoints publican eventos tras confirmar sus cambios y cada conexión abierta
+en /api/events/stream recibe los que le corresponden según su empresa, su rol y
+su usuario. Sustituye a los sondeos periódicos del frontend por una única
+conexión por pestaña.
+
+Es local a cada proceso: con varios workers cada cliente solo recibe los eventos
+publicados por el worker que atiende su conexión, por lo que el frontend debe
+seguir refrescando al reconectar (y, si se despliegan varios workers, mantener
+un sondeo lento de respaldo).
+"""
+import asyncio
+import itertools
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _value(raw: Any) -> Any:
+    return getattr(raw, "value", raw)
+
+
+class EventSubscriber:
+    """Conexión abierta: cola de eventos pendientes de enviar y su ámbito."""
+
+    def __init__(self, company: Any, role: Any, user_id: Optional[int]):
+        self.company = _value(company)
+        self.role = _value(role)
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.events_queue_size))
+        # True si se descartaron eventos por cola llena: el cliente debe refrescar
+        self.lagged = False
+
+    def accepts(self, company: Any, roles: Optional[Set[str]], user_ids: Optional[Set[int]]) -> bool:
+        # Eventos sin empresa son globales; un suscriptor sin empresa (MASTER_ADMIN) los ve todos
+        if company is not None and self.company is not None and company != self.company:
+            return False
+        if roles is None and user_ids is None:
+            return True
+        return (roles is not None and self.role in roles) or (
+            user_ids is not None and self.user_id in user_ids
+        )
+
+
+class EventBus:
+    """Difusión de eventos a las conexiones SSE del proceso"""
+
+    EVENT_VACATION_CREATED = "vacation.created"
+    EVENT_VACATION_UPDATED = "vacation.updated"
+    EVENT_VACATION_DELETED = "vacation.deleted"
+    EVENT_VACATION_STATUS = "vacation.status_changed"
+    EVENT_INSPECTION_ISSUE = "inspection.issue_reported"
+    EVENT_ACTIVITY = "activity.created"
+    EVENT_USER_STATUS = "user.status_changed"
+    EVENT_TRAFFIC_CHANGED = "traffic.changed"
+    EVENT_NOTIFICATIONS_CHANGED = "notifications.changed"
+    # Enviado al cliente cuando se han perdido eventos (cola llena)
+    EVENT_RESYNC = "resync"
+    # Enviado antes de cerrar el stream cuando la sesión deja de ser válida
+    EVENT_SESSION_ENDED = "session.ended"
+
+    _subscribers: Set[EventSubscriber] = set()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _lock = threading.Lock()
+    _ids = itertools.count(1)
+
+    @classmethod
+    def subscribe(cls, company: Any, role: Any, user_id: Optional[int]) -> EventSubscriber:
+        """Registra una conexión; debe llamarse desde el event loop del servidor."""
+        cls._loop = asyncio.get_running_loop()
+        subscriber = EventSubscriber(company, role, user_id)
+        with cls._lock:
+            cls._subscribers.add(subscriber)
+        return subscriber
+
+    @classmethod
+    def unsubscribe(cls, subscriber: EventSubscriber) -> None:
+        with cls._lock:
+            cls._subscribers.discard(subscriber)
+
+    @classmethod
+    def subscriber_count(cls) -> int:
+        return len(cls._subscribers)
+
+    @classmethod
+    def publish(
+        cls,
+        event_type: str,
+        data: Optional[Dict[str, Any]] = None,
+        *,
+        company: Any = None,
+        roles: Optional[Iterable[Any]] = None,
+        user_ids: Optional[Iterable[Optional[int]]] = None,
+    ) -> None:
+        """
+        Publica un evento. Nunca lanza excepción: un fallo al notificar no debe
+        afectar a la operación que ya se ha confirmado.
+
+        Args:
+            event_type: Tipo de evento (constantes EVENT_*)
+            data: Carga JSON del evento
+            company: Empresa afectada (None = todas)
+            roles: Roles destinatarios (None = sin filtro de rol)
+            user_ids: Usuarios destinatarios además de los roles indicados
+        """
+        if not cls._subscribers:
+            return
+        try:
+            event = {"id": next(cls._ids), "event": event_type, "data": data or {}}
+            role_set = {str(_value(role)) for role in roles} if roles is not None else None
+            user_set = {uid for uid in user_ids if uid is not None} if user_ids is not None else None
+            args = (event, _value(company), role_set, user_set)
+
+            loop = cls._loop
+            if loop is None or loop.is_closed():
+                return
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                cls._dispatch(*args)
+            else:
+                # Endpoints síncronos (threadpool): entregar en el hilo del event loop
+                loop.call_soon_threadsafe(cls._dispatch, *args)
+        except Exception as exc:  # pragma: no cover - notificación best-effort
+            logger.warning(f"No se pudo publicar el evento {event_type}: {exc}")
+
+    @classmethod
+    def _dispatch(
+        cls,
+        event: Dict[str, Any],
+        company: Any,
+        roles: Optional[Set[str]],
+        user_ids: Optional[Set[int]],
+    ) -> None:
+        with cls._lock:
+            subscribers: List[EventSubscriber] = list(cls._subscribers)
+        for subscriber in subscribers:
+            if not subscriber.accepts(company, roles, user_ids):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Cierra todas las conexiones (apagado del servidor)."""
+        with cls._lock:
+            subscribers = list(cls._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
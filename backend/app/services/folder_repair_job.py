@@ -0,0 +1,290 @@
+"""
+Trabajo en segundo plano para reparar la estructura de carpetas de todos los usuarios.
+
+Recorre los usuarios por páginas ordenadas por id (sin el límite de
+UserService.get_all_users) y repara cada página con un pool de hilos. Tras
+completar cada página se guarda el progreso en el archivo de estado
+(settings.folder_repair_state_file, dentro de files_base_path), de modo que si
+el proceso se interrumpe o el trabajo falla se puede reanudar desde el último
+usuario procesado en lugar de empezar de cero.
+
+Con varios workers solo uno ejecuta el trabajo: se reclama creando de forma
+atómica un archivo de bloqueo junto al estado (O_CREAT | O_EXCL). Mientras el
+trabajo corre, un hilo de latido renueva el mtime del bloqueo cada
+HEARTBEAT_INTERVAL_SECONDS, tarde lo que tarde cada página. Un bloqueo sin
+latido durante HEARTBEAT_TIMEOUT_SECONDS pertenece a un proceso caído: se retira
+con un rename atómico (solo un worker lo consigue) y se vuelve a reclamar.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database.connection import SessionLocal
+from app.models.user import User
+from app.services.folder_structure_service import FolderStructureService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE_NAME = "folder_repair_job.json"
+PAGE_SIZE = 200
+MAX_WORKERS = 8
+# Máximo de fallos detallados que se guardan en el estado
+MAX_FAILURE_DETAILS = 200
+# Cada cuánto se renueva el latido del bloqueo mientras el trabajo corre
+HEARTBEAT_INTERVAL_SECONDS = 15
+# Sin latido durante este tiempo, el bloqueo se considera de un proceso caído
+HEARTBEAT_TIMEOUT_SECONDS = 120
+# Estados desde los que se reanuda conservando el punto de control
+RESUMABLE_STATUSES = ("running", "interrupted", "failed")
+
+
+class FolderRepairJob:
+    """Gestión del trabajo de reparación masiva (un único trabajo a la vez)"""
+
+    _lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+    _stop_heartbeat: Optional[threading.Event] = None
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat()
+
+    @staticmethod
+    def _state_file() -> str:
+        configured = settings.folder_repair_state_file or DEFAULT_STATE_FILE_NAME
+        return os.path.join(settings.files_base_path, configured)
+
+    @classmethod
+    def _lock_file(cls) -> str:
+        return f"{cls._state_file()}.lock"
+
+    @classmethod
+    def _lock_age(cls) -> Optional[float]:
+        """Segundos desde el último latido del bloqueo, o None si no hay bloqueo."""
+        try:
+            return time.time() - os.stat(cls._lock_file()).st_mtime
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def _try_claim(cls) -> bool:
+        """Crea el bloqueo de forma atómica; False si otro proceso lo mantiene vivo."""
+        lock_file = cls._lock_file()
+        os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                try:
+                    current = os.stat(lock_file)
+                except FileNotFoundError:
+                    continue
+                if time.time() - current.st_mtime < HEARTBEAT_TIMEOUT_SECONDS:
+                    return False
+                # Bloqueo huérfano: el rename es atómico, así que solo un worker lo retira
+                stale_path = f"{lock_file}.stale.{socket.gethostname()}.{os.getpid()}"
+                try:
+                    os.rename(lock_file, stale_path)
+                except FileNotFoundError:
+                    continue
+                if os.stat(stale_path).st_ino != current.st_ino:
+                    # Otro worker ya lo había sustituido por uno vivo: se devuelve sin pisar
+                    try:
+                        os.link(stale_path, lock_file)
+                    except FileExistsError:
+                        pass
+                    os.remove(stale_path)
+                    return False
+                os.remove(stale_path)
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"host": socket.gethostname(), "pid": os.getpid(), "claimed_at": cls._now()}, f)
+            return True
+        return False
+
+    @classmethod
+    def _release(cls) -> None:
+        try:
+            os.remove(cls._lock_file())
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def _heartbeat_loop(cls, stop: threading.Event) -> None:
+        while not stop.wait(HEARTBEAT_INTERVAL_SECONDS):
+            try:
+                os.utime(cls._lock_file())
+            except OSError as e:
+                logger.warning(f"No se pudo renovar el latido de la reparación masiva: {e}")
+
+    @classmethod
+    def _load_state(cls) -> Optional[Dict[str, Any]]:
+        try:
+            with open(cls._state_file(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Estado de reparación ilegible, se ignora: {e}")
+            return None
+
+    @classmethod
+    def _save_state(cls, state: Dict[str, Any]) -> None:
+        state["updated_at"] = cls._now()
+        state_file = cls._state_file()
+        os.makedirs(os.path.dirname(state_file), exist_ok=True)
+        tmp_path = f"{state_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, state_file)
+
+    @classmethod
+    def _is_alive(cls) -> bool:
+        if cls._thread is not None and cls._thread.is_alive():
+            return True
+        # Puede estar ejecutándose en otro proceso (varios workers)
+        age = cls._lock_age()
+        return age is not None and age < HEARTBEAT_TIMEOUT_SECONDS
+
+    @classmethod
+    def status(cls) -> Dict[str, Any]:
+        """Estado actual del trabajo (o idle si nunca se ha lanzado)."""
+        state = cls._load_state()
+        if state is None:
+            return {"status": "idle"}
+        if state.get("status") == "running" and not cls._is_alive():
+            state["status"] = "interrupted"
+        return state
+
+    @classmethod
+    def start(cls, resume: bool = True) -> Dict[str, Any]:
+        """
+        Lanza el trabajo en un hilo de fondo.
+
+        Args:
+            resume: Si el trabajo anterior quedó interrumpido o falló, continuar
+                desde su último punto de control en lugar de empezar de cero
+
+        Returns:
+            Estado inicial del trabajo
+
+        Raises:
+            RuntimeError: Si ya hay un trabajo en ejecución (en este u otro worker)
+        """
+        with cls._lock:
+            if (cls._thread is not None and cls._thread.is_alive()) or not cls._try_claim():
+                raise RuntimeError("Ya hay una reparación en curso")
+
+            try:
+                state = cls._initial_state(resume)
+                cls._save_state(state)
+            except Exception:
+                cls._release()
+                raise
+            cls._stop_heartbeat = threading.Event()
+            threading.Thread(
+                target=cls._heartbeat_loop, args=(cls._stop_heartbeat,), name="folder-repair-heartbeat", daemon=True
+            ).start()
+            cls._thread = threading.Thread(target=cls._run, args=(state,), name="folder-repair-job", daemon=True)
+            cls._thread.start()
+        return cls.status()
+
+    @classmethod
+    def _initial_state(cls, resume: bool) -> Dict[str, Any]:
+        """Estado de arranque; se llama con el bloqueo ya reclamado."""
+        previous = cls._load_state()
+        if resume and previous and previous.get("status") in RESUMABLE_STATUSES:
+            state = previous
+            state.pop("heartbeat", None)
+            state["status"] = "running"
+            state["resumed_at"] = cls._now()
+            state["finished_at"] = None
+            state["error"] = None
+            return state
+        return {
+            "status": "running",
+            "started_at": cls._now(),
+            "finished_at": None,
+            "last_user_id": 0,
+            "total_users": cls._count_users(),
+            "processed": 0,
+            "repaired": 0,
+            "failed": 0,
+            "failures": [],
+            "error": None,
+        }
+
+    @staticmethod
+    def _count_users() -> int:
+        db = SessionLocal()
+        try:
+            return db.query(User).count()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _fetch_page(last_user_id: int) -> List[Tuple[int, str, Any, str, str, str]]:
+        """Página de usuarios con id > last_user_id (paginación por clave, sin OFFSET)."""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(User.id, User.dni_nie, User.role, User.first_name, User.last_name, User.department)
+                .filter(User.id > last_user_id)
+                .order_by(User.id)
+                .limit(PAGE_SIZE)
+                .all()
+            )
+            return [tuple(row) for row in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _repair_one(row: Tuple[int, str, Any, str, str, str]) -> Tuple[str, bool, Optional[str]]:
+        _, dni_nie, role, first_name, last_name, department = row
+        try:
+            ok = FolderStructureService.repair_folder_structure(dni_nie, role, first_name, last_name, department)
+            return dni_nie, ok, None if ok else "No se pudo reparar"
+        except Exception as e:
+            return dni_nie, False, str(e)
+
+    @classmethod
+    def _run(cls, state: Dict[str, Any]) -> None:
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="folder-repair") as pool:
+                while True:
+                    page = cls._fetch_page(int(state["last_user_id"]))
+                    if not page:
+                        break
+                    for dni_nie, ok, message in pool.map(cls._repair_one, page):
+                        state["processed"] += 1
+                        if ok:
+                            state["repaired"] += 1
+                        else:
+                            state["failed"] += 1
+                            if len(state["failures"]) < MAX_FAILURE_DETAILS:
+                                state["failures"].append({"dni_nie": dni_nie, "message": message})
+                    # Punto de control: la página entera está procesada
+                    state["last_user_id"] = page[-1][0]
+                    cls._save_state(state)
+            state["status"] = "completed"
+            logger.info(
+                f"Reparación masiva completada: {state['repaired']} reparadas, {state['failed']} fallidas"
+            )
+        except Exception as e:
+            state["status"] = "failed"
+            state["error"] = str(e)
+            logger.error(f"Error en la reparación masiva de carpetas: {e}")
+        state["finished_at"] = cls._now()
+        try:
+            cls._save_state(state)
+        finally:
+            if cls._stop_heartbeat is not None:
+                cls._stop_heartbeat.set()
+            cls._release()
@@ -0,0 +1,150 @@
+"""Procesado de las fotos de inspecciones de camiones.
+
+Las fotos llegan del móvil a resolución completa (hasta 10 MB). Al subirlas se
+aplica la orientación EXIF, se eliminan los metadatos (EXIF/GPS) y se guarda una
+versión de resolución acotada en WebP o JPEG junto a una miniatura
+(`<nombre>_thumb.<ext>`) para las pantallas de revisión.
+
+Pillow es opcional y se importa de forma perezosa en el primer uso para no
+penalizar el arranque: sin la librería se guarda el archivo original tal cual y
+la variante "thumb" sirve la imagen completa.
+
+Todo el trabajo es bloqueante (decodificar y comprimir): los endpoints lo
+ejecutan con run_in_threadpool para no bloquear el event loop.
+"""
+
+import io
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InspectionImageService:
+    """Normalización de fotos de inspección y generación de miniaturas"""
+
+    SIZE_FULL = "full"
+    SIZE_THUMB = "thumb"
+    THUMB_SUFFIX = "_thumb"
+
+    @staticmethod
+    def _load_pil():
+        try:  # pragma: no cover - import condicional
+            from PIL import Image, ImageOps
+        except ImportError:  # pragma: no cover
+            return None
+        return Image, ImageOps
+
+    @staticmethod
+    def _format() -> str:
+        fmt = (settings.inspection_image_format or "webp").lower()
+        return "jpeg" if fmt in ("jpg", "jpeg") else "webp"
+
+    @classmethod
+    def _extension(cls) -> str:
+        return ".jpg" if cls._format() == "jpeg" else ".webp"
+
+    @staticmethod
+    def _write_atomic(target: Path, data: bytes) -> None:
+        # Otra petición concurrente nunca ve una imagen a medias
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def _encode(cls, image, max_px: int) -> bytes:
+        """Reduce la imagen a max_px de lado mayor y la comprime sin metadatos."""
+        image = image.copy()
+        image.thumbnail((max_px, max_px))
+        fmt = cls._format()
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        buffer = io.BytesIO()
+        # Sin exif=... Pillow no copia metadatos al guardar
+        image.save(buffer, format=fmt.upper(), quality=settings.inspection_image_quality, optimize=fmt == "jpeg")
+        return buffer.getvalue()
+
+    @classmethod
+    def thumbnail_path(cls, image_path: str | os.PathLike[str]) -> Path:
+        path = Path(image_path)
+        return path.with_name(f"{path.stem}{cls.THUMB_SUFFIX}{cls._extension()}")
+
+    @classmethod
+    def save_upload(cls, contents: bytes, folder: str, base_name: str, original_extension: str) -> str:
+        """
+        Guarda una foto subida normalizada y su miniatura.
+
+        Args:
+            contents: Bytes del archivo recibido
+            folder: Carpeta de destino
+            base_name: Nombre del archivo sin extensión
+            original_extension: Extensión recibida (se usa solo sin Pillow)
+
+        Returns:
+            Ruta (relativa a folder, unida con os.path.join) de la imagen principal
+
+        Raises:
+            ValueError: Si Pillow está disponible y el archivo no es una imagen válida
+        """
+        os.makedirs(folder, exist_ok=True)
+        pil = cls._load_pil()
+        if pil is None:
+            file_path = os.path.join(folder, f"{base_name}{original_extension}")
+            cls._write_atomic(Path(file_path), contents)
+            return file_path
+
+        Image, ImageOps = pil
+        try:
+            with Image.open(io.BytesIO(contents)) as source:
+                source.load()
+                image = ImageOps.exif_transpose(source)
+        except Exception as e:
+            raise ValueError("El archivo no es una imagen válida") from e
+
+        file_path = os.path.join(folder, f"{base_name}{cls._extension()}")
+        cls._write_atomic(Path(file_path), cls._encode(image, settings.inspection_image_max_px))
+        cls._write_atomic(cls.thumbnail_path(file_path), cls._encode(image, settings.inspection_image_thumb_px))
+        return file_path
+
+    @classmethod
+    def get_variant(cls, image_path: str | os.PathLike[str], size: str) -> Path:
+        """
+        Ruta de la variante pedida de una imagen ya autorizada.
+
+        Las fotos anteriores a este procesado no tienen miniatura: se genera en el
+        primer acceso. Sin Pillow (o si falla) se devuelve la imagen completa.
+        """
+        source = Path(image_path)
+        if size != cls.SIZE_THUMB or source.stem.endswith(cls.THUMB_SUFFIX):
+            return source
+
+        thumb = cls.thumbnail_path(source)
+        if thumb.exists():
+            return thumb
+
+        generated = cls._generate_thumbnail(source, thumb)
+        return generated or source
+
+    @classmethod
+    def _generate_thumbnail(cls, source: Path, target: Path) -> Optional[Path]:
+        pil = cls._load_pil()
+        if pil is None:
+            return None
+        Image, ImageOps = pil
+        try:
+            with Image.open(source) as original:
+                original.load()
+                image = ImageOps.exif_transpose(original)
+            cls._write_atomic(target, cls._encode(image, settings.inspection_image_thumb_px))
+        except Exception as e:
+            logger.warning(f"No se pudo generar la miniatura de {source.name}: {e}")
+            return None
+        return target
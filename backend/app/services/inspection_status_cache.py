@@ -0,0 +1,30 @@
+"""
+Caché por conductor de los datos que necesita /api/truck-inspections/check-needed.
+
+Guarda, por user_id, la fecha de la última inspección y las solicitudes manuales
+pendientes (las dos consultas del endpoint). Los campos que dependen de la hora
+actual (días transcurridos, próxima revisión) y la configuración automática se
+recalculan en cada llamada a partir de estos datos.
+
+Se invalida al crear una inspección y al enviar solicitudes manuales, pero solo
+en el proceso que atendió el cambio. Con varios workers el TTL es lo que acota
+el tiempo que otro proceso puede seguir pidiendo una inspección ya hecha, por
+eso es de pocos segundos (settings.inspection_status_cache_seconds): basta para
+absorber las ráfagas de sondeos de varias pestañas del mismo conductor.
+"""
+from typing import Iterable, Optional
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+# user_id -> (última inspección | None, [ManualInspectionRequest])
+inspection_status_cache = TTLCache(ttl_seconds=settings.inspection_status_cache_seconds, max_entries=4096)
+
+
+def invalidate_inspection_status(user_ids: Optional[Iterable[int]] = None) -> None:
+    """Invalida los conductores indicados (todos si user_ids es None)."""
+    if user_ids is None:
+        inspection_status_cache.invalidate()
+        return
+    targets = set(user_ids)
+    inspection_status_cache.invalidate(lambda key: key in targets)
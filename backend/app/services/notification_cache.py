@@ -0,0 +1,26 @@
+"""
+Caché del resumen de avisos (/api/notifications/summary).
+
+Las claves son (company, rol, user_id | None): los contadores de administración
+se comparten por empresa y rol; los de trabajador dependen del propio usuario.
+invalidate_notification_summary() se llama tras cada commit que cambia alguno de
+los contadores (vacaciones, incidencias, órdenes directas, solicitudes manuales
+y configuración de inspecciones automáticas). El TTL corto cubre lo que cambia
+solo con el paso del tiempo (ventana de 30 días, vencimiento de la revisión).
+"""
+from typing import Any
+
+from app.services.event_bus import EventBus
+from app.utils.ttl_cache import TTLCache
+
+notification_summary_cache = TTLCache(ttl_seconds=30, max_entries=2048)
+
+
+def invalidate_notification_summary(company: Any = None) -> None:
+    """Invalida las entradas de la empresa afectada (todas si company es None)."""
+    # Import local: vacation_cache también importa este módulo
+    from app.services.vacation_cache import company_matches
+
+    notification_summary_cache.invalidate(lambda key: company_matches(key, company))
+    # Los clientes conectados por SSE vuelven a pedir el resumen
+    EventBus.publish(EventBus.EVENT_NOTIFICATIONS_CHANGED, company=company)
@@ -0,0 +1,139 @@
+"""Servicio de miniaturas de la primera página de PDFs.
+
+Renderiza la primera página con PyMuPDF (fitz) a una imagen pequeña y la guarda
+en una caché en disco. La clave de caché combina ruta, tamaño y fecha de
+modificación del PDF junto con la resolución y el formato, de modo que al
+sustituir el archivo se genera una miniatura nueva sin invalidación explícita.
+
+PyMuPDF (fitz) es opcional y se importa de forma perezosa en el primer uso para
+no penalizar el arranque: sin la librería el servicio devuelve None y los
+endpoints responden con un error claro.
+"""
+
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.utils.file_delivery import serve_file
+
+logger = logging.getLogger(__name__)
+
+
+class PdfThumbnailService:
+    """Generación y caché de miniaturas de PDFs"""
+
+    MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+    @staticmethod
+    def is_available() -> bool:
+        return importlib.util.find_spec("fitz") is not None
+
+    @staticmethod
+    def _load_fitz():
+        try:  # pragma: no cover - import condicional
+            import fitz  # PyMuPDF
+        except ImportError:  # pragma: no cover
+            return None
+        return fitz
+
+    @classmethod
+    def _format(cls) -> str:
+        fmt = (settings.thumbnail_format or "png").lower()
+        return "jpeg" if fmt in ("jpg", "jpeg") else "png"
+
+    @classmethod
+    def media_type(cls) -> str:
+        return cls.MEDIA_TYPES[cls._format()]
+
+    @classmethod
+    def _cache_path(cls, pdf_path: Path, stat_result: os.stat_result) -> Path:
+        fmt = cls._format()
+        key = f"{pdf_path}|{stat_result.st_size}|{stat_result.st_mtime_ns}|{settings.thumbnail_dpi}|{fmt}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        extension = "jpg" if fmt == "jpeg" else "png"
+        # Dos niveles de subcarpeta para no acumular miles de archivos en un directorio
+        return Path(settings.thumbnails_cache_path) / digest[:2] / f"{digest}.{extension}"
+
+    @classmethod
+    def get_thumbnail(cls, pdf_path: str | os.PathLike[str]) -> Optional[Path]:
+        """
+        Devuelve la ruta de la miniatura del PDF, generándola si no está en caché.
+
+        Args:
+            pdf_path: Ruta del PDF (ya validada por el endpoint)
+
+        Returns:
+            Ruta de la imagen, o None si PyMuPDF no está disponible o el PDF
+            no se puede renderizar
+        """
+        fitz = cls._load_fitz()
+        if fitz is None:
+            return None
+
+        source = Path(pdf_path).resolve()
+        try:
+            stat_result = source.stat()
+        except OSError:
+            return None
+
+        target = cls._cache_path(source, stat_result)
+        if target.exists():
+            return target
+
+        try:
+            doc = fitz.open(str(source))
+            try:
+                if doc.page_count == 0:
+                    return None
+                pixmap = doc[0].get_pixmap(dpi=settings.thumbnail_dpi)
+                if cls._format() == "jpeg":
+                    data = pixmap.tobytes("jpeg", jpg_quality=80)
+                else:
+                    data = pixmap.tobytes("png")
+            finally:
+                doc.close()
+        except Exception as e:
+            logger.warning(f"No se pudo generar la miniatura de {source.name}: {e}")
+            return None
+
+        # Escritura atómica: otra petición concurrente nunca ve una imagen a medias
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+        return target
+
+    @classmethod
+    def warm_up(cls, pdf_path: str | os.PathLike[str]) -> None:
+        """Genera la miniatura en segundo plano tras una subida (errores solo se registran)."""
+        if Path(pdf_path).suffix.lower() != ".pdf":
+            return
+        try:
+            cls.get_thumbnail(pdf_path)
+        except Exception as e:
+            logger.warning(f"Error precalculando miniatura de {pdf_path}: {e}")
+
+
+async def serve_pdf_thumbnail(request: Request, pdf_path: str | os.PathLike[str]) -> Response:
+    """Respuesta con la miniatura de un PDF ya autorizado (renderizado fuera del event loop)."""
+    if not PdfThumbnailService.is_available():
+        raise HTTPException(status_code=501, detail="Miniaturas no disponibles: PyMuPDF no está instalado")
+    thumbnail = await run_in_threadpool(PdfThumbnailService.get_thumbnail, pdf_path)
+    if thumbnail is None:
+        raise HTTPException(status_code=422, detail="No se pudo generar la miniatura del documento")
+    return serve_file(
+        request,
+        thumbnail,
+        media_type=PdfThumbnailService.media_type(),
+        disposition="inline",
+        headers={"Cache-Control": "private, max-age=86400"},
+    )
@@ -0,0 +1,212 @@
+"""
+Índice en memoria de nombres de archivos y carpetas de Tráfico.
+
+Se construye perezosamente recorriendo settings.traffic_files_base_path y se
+mantiene al día de forma incremental desde los endpoints que modifican el árbol
+(subida, creación y borrado). Como red de seguridad frente a cambios hechos
+fuera de la API (copias directas al disco) se reconstruye completo cada
+settings.traffic_search_reindex_seconds.
+
+Solo hay una reconstrucción a la vez. La primera bloquea a quien la necesita;
+las periódicas se hacen en un hilo en segundo plano mientras se sigue usando el
+índice anterior. Los add()/remove() que llegan durante un recorrido se anotan y
+se aplican sobre el índice nuevo antes de sustituirlo, para no perderlos.
+
+Las búsquedas ignoran mayúsculas y tildes ("albaran" encuentra "Albarán").
+"""
+import logging
+import os
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+IGNORED_FILES = {"thumbs.db", "desktop.ini"}
+
+
+def normalize_search_text(value: str) -> str:
+    """Minúsculas y sin marcas diacríticas para comparar."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class TrafficSearchIndex:
+    """Índice de rutas relativas -> (nombre normalizado, ruta normalizada, es_carpeta)"""
+
+    _entries: Dict[str, Tuple[str, str, bool]] = {}
+    _built_at: Optional[float] = None
+    _lock = threading.RLock()
+    # Garantiza un solo recorrido a la vez (se libera desde el hilo que reconstruye)
+    _rebuild_lock = threading.Lock()
+    # Cambios recibidos durante un recorrido: ("add", ruta, es_carpeta) / ("remove", ruta, False)
+    _pending_ops: Optional[List[Tuple[str, str, bool]]] = None
+
+    @classmethod
+    def _base_path(cls) -> Path:
+        return Path(settings.traffic_files_base_path).resolve()
+
+    @classmethod
+    def _entry(cls, relative_path: str, is_dir: bool) -> Tuple[str, str, bool]:
+        name = relative_path.rsplit("/", 1)[-1]
+        return normalize_search_text(name), normalize_search_text(relative_path), is_dir
+
+    @classmethod
+    def rebuild(cls) -> None:
+        """Recorre el árbol completo y sustituye el índice (espera si ya hay otro recorrido)."""
+        with cls._rebuild_lock:
+            cls._rebuild_locked()
+
+    @classmethod
+    def _rebuild_locked(cls) -> None:
+        with cls._lock:
+            cls._pending_ops = []
+        try:
+            cls._walk_and_swap()
+        finally:
+            with cls._lock:
+                cls._pending_ops = None
+
+    @classmethod
+    def _walk_and_swap(cls) -> None:
+        base = cls._base_path()
+        entries: Dict[str, Tuple[str, str, bool]] = {}
+        started = time.monotonic()
+        stack = [base]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                            if not is_dir and (not entry.is_file() or entry.name.lower() in IGNORED_FILES):
+                                continue
+                        except OSError:
+                            continue
+                        relative = Path(entry.path).relative_to(base).as_posix()
+                        entries[relative] = cls._entry(relative, is_dir)
+                        if is_dir:
+                            stack.append(Path(entry.path))
+            except OSError:
+                continue
+
+        with cls._lock:
+            # Aplicar los cambios hechos por la API mientras se recorría el disco
+            for op, relative_path, is_dir in cls._pending_ops or []:
+                if op == "add":
+                    entries[relative_path] = cls._entry(relative_path, is_dir)
+                else:
+                    cls._remove_from(entries, relative_path)
+            cls._entries = entries
+            cls._built_at = time.monotonic()
+        logger.info(f"Índice de búsqueda de Tráfico: {len(entries)} entradas en {time.monotonic() - started:.2f}s")
+
+    @classmethod
+    def _background_rebuild(cls) -> None:
+        try:
+            cls._rebuild_locked()
+        except Exception as e:
+            logger.warning(f"Error reconstruyendo el índice de búsqueda de Tráfico: {e}")
+        finally:
+            cls._rebuild_lock.release()
+
+    @classmethod
+    def _ensure_built(cls) -> None:
+        with cls._lock:
+            built_at = cls._built_at
+        if built_at is None:
+            # Primera construcción: sin índice no hay nada que servir, se espera
+            with cls._rebuild_lock:
+                if cls._built_at is None:
+                    cls._rebuild_locked()
+            return
+
+        max_age = settings.traffic_search_reindex_seconds
+        if max_age > 0 and time.monotonic() - built_at > max_age:
+            # Índice caducado: se sirve el actual y se reconstruye en segundo plano
+            if cls._rebuild_lock.acquire(blocking=False):
+                try:
+                    threading.Thread(
+                        target=cls._background_rebuild, name="traffic-search-reindex", daemon=True
+                    ).start()
+                except Exception:
+                    cls._rebuild_lock.release()
+                    raise
+
+    @classmethod
+    def add(cls, relative_path: str, is_dir: bool = False) -> None:
+        """Registra un archivo o carpeta recién creado."""
+        with cls._lock:
+            if cls._pending_ops is not None:
+                cls._pending_ops.append(("add", relative_path, is_dir))
+            if cls._built_at is None:
+                # Aún no construido: la primera búsqueda lo recogerá del disco
+                return
+            cls._entries[relative_path] = cls._entry(relative_path, is_dir)
+
+    @classmethod
+    def remove(cls, relative_path: str) -> None:
+        """Elimina una entrada y, si es una carpeta, todo su contenido."""
+        with cls._lock:
+            if cls._pending_ops is not None:
+                cls._pending_ops.append(("remove", relative_path, False))
+            if cls._built_at is None:
+                return
+            cls._remove_from(cls._entries, relative_path)
+
+    @staticmethod
+    def _remove_from(entries: Dict[str, Tuple[str, str, bool]], relative_path: str) -> None:
+        prefix = relative_path.rstrip("/") + "/"
+        entries.pop(relative_path, None)
+        for key in [key for key in entries if key.startswith(prefix)]:
+            del entries[key]
+
+    @classmethod
+    def search(
+        cls,
+        query: str,
+        *,
+        prefix: bool = False,
+        path: Optional[str] = None,
+        entry_type: Optional[str] = None,
+        limit: int = 50,
+    ) -> Tuple[List[Tuple[str, bool]], int]:
+        """
+        Busca por nombre.
+
+        Args:
+            query: Texto a buscar
+            prefix: True para coincidencia al inicio del nombre; False para subcadena
+            path: Limitar a una carpeta (ruta relativa)
+            entry_type: "file", "folder" o None para ambos
+            limit: Máximo de resultados devueltos
+
+        Returns:
+            (lista de (ruta relativa, es_carpeta) ordenada, total de coincidencias)
+        """
+        cls._ensure_built()
+        needle = normalize_search_text(query.strip())
+        scope = normalize_search_text(path.strip("/")) + "/" if path and path.strip("/") else ""
+        want_dirs = None if entry_type is None else entry_type == "folder"
+
+        with cls._lock:
+            items = list(cls._entries.items())
+
+        matches: List[Tuple[bool, int, str, bool]] = []
+        for relative_path, (name, norm_path, is_dir) in items:
+            if want_dirs is not None and is_dir != want_dirs:
+                continue
+            if scope and not norm_path.startswith(scope):
+                continue
+            starts = name.startswith(needle)
+            if starts or (not prefix and needle in name):
+                # Coincidencias al inicio del nombre primero, después rutas más cortas
+                matches.append((not starts, len(relative_path), relative_path, is_dir))
+
+        matches.sort()
+        return [(relative_path, is_dir) for _, _, relative_path, is_dir in matches[:limit]], len(matches)
@@ -0,0 +1,45 @@
+"""
+Cachés en memoria derivadas de las solicitudes de vacaciones.
+
+Las claves empiezan siempre por la empresa (o None cuando un MASTER_ADMIN
+consulta sin filtro de empresa). invalidate_vacation_caches() se llama tras
+cada commit que crea, modifica, cambia de estado o elimina una solicitud.
+"""
+from typing import Any, Hashable
+
+from app.services.notification_cache import invalidate_notification_summary
+from app.utils.ttl_cache import TTLCache
+
+# Estadísticas de /api/vacations/stats: clave (company, user_id | None, year)
+vacation_stats_cache = TTLCache(ttl_seconds=60)
+# Calendario de disponibilidad del dashboard: clave (company, desde, hasta)
+availability_cache = TTLCache(ttl_seconds=120, max_entries=256)
+# Trabajadores disponibles en un día (dashboard): clave (company, "YYYY-MM-DD")
+available_workers_cache = TTLCache(ttl_seconds=30, max_entries=256)
+
+
+def _company_key(company: Any) -> Any:
+    return getattr(company, "value", company)
+
+
+def company_matches(key: Hashable, company: Any) -> bool:
+    """
+    True si la entrada pertenece a la empresa afectada o es global (sin empresa).
+    Un cambio sin empresa (datos antiguos) puede afectar a cualquier vista: invalida todo.
+    """
+    if company is None:
+        return True
+    key_company = key[0] if isinstance(key, tuple) else key
+    return key_company is None or key_company == _company_key(company)
+
+
+def invalidate_vacation_caches(company: Any) -> None:
+    """Invalida las entradas de la empresa afectada y las agregadas de todas las empresas."""
+    vacation_stats_cache.invalidate(lambda key: company_matches(key, company))
+    availability_cache.invalidate(lambda key: company_matches(key, company))
+    available_workers_cache.invalidate(lambda key: company_matches(key, company))
+    invalidate_notification_summary(company)
+
+
+def cache_key(company: Any, *parts: Hashable) -> tuple:
+    return (_company_key(company), *parts)
@@ -0,0 +1,86 @@
+"""
+Detección de solapes entre solicitudes de vacaciones.
+
+En PostgreSQL la tabla tiene una columna generada `period` (daterange inclusivo)
+con índice GiST y una restricción de exclusión que impide dos ausencias
+APROBADAS solapadas del mismo usuario (migración c4f8a2e61d37). La consulta usa
+el operador && sobre ese índice.
+
+En SQLite (o si la migración aún no se ha aplicado) se usa la consulta de rango
+equivalente, apoyada en el índice (user_id, start_date). La existencia de la
+columna se comprueba en cada consulta (catálogo pg_attribute, en la misma
+transacción), de modo que los workers arrancados antes de migrar empiezan a usar
+el índice en cuanto la migración termina.
+
+Para evitar que dos altas concurrentes del mismo usuario pasen la comprobación a
+la vez, lock_user() bloquea la fila del usuario (SELECT ... FOR UPDATE) hasta el
+commit; en SQLite las escrituras ya están serializadas y el bloqueo se omite.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.vacation import VacationRequest, VacationStatus
+
+# Nombre de la restricción de exclusión creada por la migración
+APPROVED_OVERLAP_CONSTRAINT = "excl_vacation_requests_approved_overlap"
+
+
+class VacationOverlapService:
+    """Comprobación de solapes indexada y segura ante concurrencia"""
+
+    @staticmethod
+    def _has_period_column(db: Session) -> bool:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        return bool(db.execute(text(
+            "SELECT 1 FROM pg_attribute "
+            "WHERE attrelid = to_regclass('vacation_requests') AND attname = 'period' AND NOT attisdropped"
+        )).scalar())
+
+    @staticmethod
+    def lock_user(db: Session, user_id: int) -> None:
+        """Serializa las altas de un mismo usuario hasta el commit de la transacción."""
+        if db.get_bind().dialect.name == "sqlite":
+            return
+        db.query(User.id).filter(User.id == user_id).with_for_update().first()
+
+    @classmethod
+    def find_overlapping(
+        cls,
+        db: Session,
+        user_id: int,
+        start: datetime,
+        end: datetime,
+        statuses: Iterable[VacationStatus],
+        exclude_id: Optional[int] = None,
+    ) -> Optional[VacationRequest]:
+        """
+        Primera solicitud del usuario en alguno de los estados dados que se solapa
+        con [start, end] (ambos días incluidos), o None.
+        """
+        query = db.query(VacationRequest).filter(
+            VacationRequest.user_id == user_id,
+            VacationRequest.status.in_(list(statuses)),
+        )
+        if VacationOverlapService._has_period_column(db):
+            query = query.filter(
+                text("vacation_requests.period && daterange(:overlap_start, :overlap_end, '[]')")
+            ).params(overlap_start=start.date(), overlap_end=end.date())
+        else:
+            query = query.filter(
+                VacationRequest.start_date <= end,
+                VacationRequest.end_date >= start,
+            )
+        if exclude_id is not None:
+            query = query.filter(VacationRequest.id != exclude_id)
+        return query.first()
+
+    @staticmethod
+    def is_overlap_violation(error: IntegrityError) -> bool:
+        """True si el IntegrityError procede de la restricción de exclusión de solapes."""
+        return APPROVED_OVERLAP_CONSTRAINT in str(getattr(error, "orig", error))
@@ -0,0 +1,110 @@
+"""
+Contador en memoria de solicitudes de vacaciones pendientes por empresa.
+
+Se carga con un único COUNT agrupado por empresa y después se mantiene con
+deltas que los endpoints aplican tras cada commit (alta, edición, cambio de
+estado y borrado). Así /api/vacations/pending/count, que cada pestaña de
+administración consulta periódicamente, no necesita consultar la base de datos.
+
+Un cambio confirmado mientras se ejecuta el recuento puede quedar incluido en él
+y además llegar como delta. Cada delta incrementa una generación; si cambia
+durante el recuento, el resultado se descarta y se repite.
+
+Es local a cada proceso: con varios workers un cambio atendido por otro proceso
+no se ve hasta el siguiente recuento completo (settings.vacation_pending_resync_seconds).
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.vacation import VacationRequest, VacationStatus
+
+# (empresa, estado) de una solicitud antes o después de un cambio
+RequestState = Tuple[Any, Any]
+
+# Recuentos repetidos como máximo si llegan deltas durante la consulta
+MAX_LOAD_ATTEMPTS = 3
+
+
+def _company_key(company: Any) -> Any:
+    return getattr(company, "value", company)
+
+
+class VacationPendingCounter:
+    """Pendientes por empresa (clave None = solicitudes sin empresa)"""
+
+    _counts: Optional[Dict[Any, int]] = None
+    _loaded_at: float = 0.0
+    # Se incrementa con cada record_change() (también antes de la primera carga)
+    _generation: int = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def _is_stale(cls) -> bool:
+        if cls._counts is None:
+            return True
+        resync = settings.vacation_pending_resync_seconds
+        return resync > 0 and time.monotonic() - cls._loaded_at > resync
+
+    @classmethod
+    def _load(cls, db: Session) -> None:
+        for attempt in range(MAX_LOAD_ATTEMPTS):
+            with cls._lock:
+                generation = cls._generation
+            rows = (
+                db.query(VacationRequest.company, func.count(VacationRequest.id))
+                .filter(VacationRequest.status == VacationStatus.PENDING)
+                .group_by(VacationRequest.company)
+                .all()
+            )
+            with cls._lock:
+                if cls._generation == generation or attempt == MAX_LOAD_ATTEMPTS - 1:
+                    cls._counts = {_company_key(company): int(total) for company, total in rows}
+                    # Si aún hubo cambios concurrentes, recontar en la siguiente consulta
+                    cls._loaded_at = time.monotonic() if cls._generation == generation else 0.0
+                    return
+
+    @classmethod
+    def get(cls, db: Session, company: Any = None) -> int:
+        """
+        Pendientes de la empresa indicada (None = todas las empresas).
+        Solo consulta la base de datos en la primera llamada o al caducar el recuento.
+        """
+        if cls._is_stale():
+            cls._load(db)
+        with cls._lock:
+            counts = cls._counts or {}
+            if company is None:
+                return sum(counts.values())
+            return counts.get(_company_key(company), 0)
+
+    @classmethod
+    def record_change(cls, before: Optional[RequestState], after: Optional[RequestState]) -> None:
+        """
+        Aplica el efecto de un cambio ya confirmado.
+
+        Args:
+            before: (empresa, estado) antes del cambio, o None si es un alta
+            after: (empresa, estado) después del cambio, o None si es un borrado
+        """
+        with cls._lock:
+            cls._generation += 1
+            if cls._counts is None:
+                # Aún sin cargar: el primer get() hará el recuento completo
+                return
+            if before is not None and before[1] == VacationStatus.PENDING:
+                key = _company_key(before[0])
+                cls._counts[key] = max(0, cls._counts.get(key, 0) - 1)
+            if after is not None and after[1] == VacationStatus.PENDING:
+                key = _company_key(after[0])
+                cls._counts[key] = cls._counts.get(key, 0) + 1
+
+    @classmethod
+    def reset(cls) -> None:
+        """Fuerza un recuento completo en la siguiente consulta."""
+        with cls._lock:
+            cls._counts = None
@@ -0,0 +1,81 @@
+"""
+Cálculo del uso anual de días de ausencia directamente en la base de datos.
+
+Suma (fecha_fin - fecha_inicio + 1) agrupando por usuario y estado en una única
+consulta, en lugar de cargar cada solicitud y sumar duration_days en Python.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Date, cast, func
+from sqlalchemy.orm import Session
+
+from app.models.vacation import AbsenceType, VacationRequest, VacationStatus
+
+
+class VacationUsageService:
+    """Servicio de consulta de días de vacaciones usados y pendientes"""
+
+    @staticmethod
+    def _duration_days_expr(dialect_name: str):
+        """Días naturales incluidos entre start_date y end_date (ambos inclusive)."""
+        if dialect_name == "postgresql":
+            return cast(VacationRequest.end_date, Date) - cast(VacationRequest.start_date, Date) + 1
+        # SQLite y otros: diferencia de días julianos sobre la parte de fecha
+        return (
+            func.julianday(func.date(VacationRequest.end_date))
+            - func.julianday(func.date(VacationRequest.start_date))
+            + 1
+        )
+
+    @staticmethod
+    def get_usage_by_user(
+        db: Session,
+        user_ids: Iterable[int],
+        year: int,
+        company: Any = None,
+        absence_type: Optional[AbsenceType] = None,
+    ) -> Dict[int, Tuple[int, int]]:
+        """
+        Días aprobados y pendientes por usuario para un año.
+
+        Args:
+            db: Sesión de base de datos
+            user_ids: Usuarios a consultar
+            year: Año de inicio de las solicitudes
+            company: Empresa a la que restringir (None = sin filtro)
+            absence_type: Tipo de ausencia opcional
+
+        Returns:
+            Diccionario user_id -> (días aprobados, días pendientes); los usuarios
+            sin solicitudes aparecen con (0, 0)
+        """
+        ids = sorted({int(uid) for uid in user_ids})
+        usage: Dict[int, Tuple[int, int]] = {uid: (0, 0) for uid in ids}
+        if not ids:
+            return usage
+
+        days = VacationUsageService._duration_days_expr(db.get_bind().dialect.name)
+        query = db.query(
+            VacationRequest.user_id,
+            VacationRequest.status,
+            func.coalesce(func.sum(days), 0),
+        ).filter(
+            VacationRequest.user_id.in_(ids),
+            VacationRequest.start_date >= datetime(year, 1, 1),
+            VacationRequest.start_date < datetime(year + 1, 1, 1),
+            VacationRequest.status.in_([VacationStatus.APPROVED, VacationStatus.PENDING]),
+        )
+        if company is not None:
+            query = query.filter(VacationRequest.company == company)
+        if absence_type is not None:
+            query = query.filter(VacationRequest.absence_type == absence_type)
+
+        for user_id, status, total in query.group_by(VacationRequest.user_id, VacationRequest.status):
+            approved, pending = usage[user_id]
+            if status == VacationStatus.APPROVED:
+                approved = int(total)
+            else:
+                pending = int(total)
+            usage[user_id] = (approved, pending)
+        return usage
@@ -0,0 +1,55 @@
+"""
+Peticiones condicionales (ETag débil / 304) para listados consultados periódicamente.
+
+El ETag se calcula a partir de un "sello de versión" barato en lugar del cuerpo
+de la respuesta: para tablas, el número de filas, el máximo de updated_at y el
+máximo id del conjunto filtrado (una sola consulta agregada); para directorios,
+su mtime. Si coincide con If-None-Match se responde 304 sin ejecutar la consulta
+completa ni serializar.
+
+El sello no detecta cambios en tablas relacionadas (p. ej. el nombre del
+empleado mostrado en una solicitud); esos datos se refrescan en la siguiente
+modificación del listado o al recargar sin caché.
+"""
+import hashlib
+from typing import Any, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+
+from app.utils.file_delivery import is_not_modified
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def query_version(query: Query, id_column: Any, updated_column: Any) -> Tuple[int, Any, Any]:
+    """
+    (filas, max(updated_at), max(id)) de una consulta ya filtrada.
+    Debe llamarse antes de añadir opciones de carga (joinedload), orden o paginación.
+    """
+    count, last_update, last_id = query.with_entities(
+        func.count(id_column), func.max(updated_column), func.max(id_column)
+    ).one()
+    return int(count or 0), last_update, last_id
+
+
+def list_etag(request: Request, *stamp: Any) -> str:
+    """
+    ETag débil para un listado: combina el sello de versión con la query string
+    (filtros y paginación) y el ámbito que se pase en stamp (empresa, usuario...).
+    """
+    raw = "|".join([request.url.path, str(request.url.query), *(str(part) for part in stamp)])
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Respuesta 304 si el cliente ya tiene esta versión; None en caso contrario."""
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
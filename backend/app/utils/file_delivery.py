@@ -0,0 +1,211 @@
+"""
+Entrega de archivos del filesystem a través de la API.
+
+Centraliza la lógica común de descargas y previsualizaciones:
+  - Peticiones condicionales (ETag / Last-Modified -> 304 Not Modified).
+  - Peticiones parciales (Range -> 206), delegadas en FileResponse de Starlette,
+    que además usa la extensión ASGI "pathsend" (sendfile del kernel) cuando el
+    servidor la soporta.
+  - Modo opcional de descarga delegada: tras la verificación de permisos en
+    Python se devuelve una cabecera X-Accel-Redirect (nginx) o X-Sendfile
+    (Apache/lighttpd) y el proxy frontal sirve los bytes.
+
+El modo se controla con settings.file_delivery_mode ("", "x-accel-redirect" o
+"x-sendfile").
+
+Con x-accel-redirect cada raíz de almacenamiento se publica en nginx bajo su
+propia location interna (las raíces por defecto no cuelgan todas de
+files_base_path):
+
+    <prefijo>/            -> files_base_path
+    <prefijo>/users/      -> user_files_base_path
+    <prefijo>/traffic/    -> traffic_files_base_path
+    <prefijo>/documents/  -> documents_files_base_path
+    <prefijo>/payroll/    -> payroll_files_base_path
+    <prefijo>/orders/     -> orders_files_base_path
+    <prefijo>/thumbnails/ -> thumbnails_cache_path
+    <prefijo>/<nombre>/   -> raíces añadidas con register_delivery_root()
+
+donde <prefijo> es settings.file_delivery_internal_prefix. Un archivo fuera de
+todas las raíces se sirve desde Python y se registra un aviso.
+"""
+import logging
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from app.config import settings
+
+DELIVERY_MODE_DIRECT = ""
+DELIVERY_MODE_ACCEL = "x-accel-redirect"
+DELIVERY_MODE_SENDFILE = "x-sendfile"
+
+logger = logging.getLogger(__name__)
+
+# Raíces adicionales publicadas en nginx: nombre de la location -> ruta
+_extra_roots: Dict[str, str] = {}
+# Carpetas fuera de toda raíz ya avisadas (un aviso por carpeta y proceso)
+_warned_outside: Set[str] = set()
+_warned_lock = threading.Lock()
+
+
+def register_delivery_root(name: str, path: str | os.PathLike[str]) -> None:
+    """Publica una carpeta más para X-Accel-Redirect bajo <prefijo>/<name>/."""
+    _extra_roots[name.strip("/")] = os.fspath(path)
+
+
+def _delivery_roots() -> List[Tuple[Path, str]]:
+    """(raíz resuelta, location interna) de la más específica a la más general."""
+    prefix = settings.file_delivery_internal_prefix.rstrip("/")
+    roots = [
+        (settings.files_base_path, prefix),
+        (settings.user_files_base_path, f"{prefix}/users"),
+        (settings.traffic_files_base_path, f"{prefix}/traffic"),
+        (settings.documents_files_base_path, f"{prefix}/documents"),
+        (settings.payroll_files_base_path, f"{prefix}/payroll"),
+        (settings.orders_files_base_path, f"{prefix}/orders"),
+        (settings.thumbnails_cache_path, f"{prefix}/thumbnails"),
+    ]
+    roots.extend((path, f"{prefix}/{name}") for name, path in _extra_roots.items())
+    resolved = [(Path(path).resolve(), location) for path, location in roots if path]
+    # La raíz más larga primero: una carpeta anidada usa su propia location
+    return sorted(resolved, key=lambda item: len(item[0].parts), reverse=True)
+
+
+def _accel_location(file_path: Path) -> Optional[str]:
+    for root, location in _delivery_roots():
+        try:
+            relative = file_path.relative_to(root).as_posix()
+        except ValueError:
+            continue
+        return f"{location}/{relative}"
+
+    parent = str(file_path.parent)
+    with _warned_lock:
+        first_time = parent not in _warned_outside
+        _warned_outside.add(parent)
+    if first_time:
+        logger.warning(
+            f"X-Accel-Redirect: {parent} no está bajo ninguna raíz publicada; "
+            "sus archivos se sirven desde Python"
+        )
+    return None
+
+
+def build_etag(stat_result: os.stat_result) -> str:
+    """ETag débil derivado de mtime y tamaño (no requiere leer el archivo)."""
+    return f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _content_disposition(disposition: str, filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil: ignorar el prefijo W/
+    target = etag.removeprefix("W/")
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return target in candidates
+
+
+def is_not_modified(request: Request, etag: str, mtime: Optional[float] = None) -> bool:
+    """Evalúa If-None-Match / If-Modified-Since según RFC 9110."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and mtime is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= int(since)
+    return False
+
+
+def _offload_headers(file_path: Path) -> Optional[Dict[str, str]]:
+    """Cabeceras de descarga delegada al proxy, o None si no aplica."""
+    mode = (settings.file_delivery_mode or "").strip().lower()
+    if mode == DELIVERY_MODE_SENDFILE:
+        # Las cabeceras HTTP deben ser ASCII: rutas con tildes van percent-encoded
+        return {"X-Sendfile": quote(str(file_path))}
+    if mode == DELIVERY_MODE_ACCEL:
+        location = _accel_location(file_path)
+        if location is None:
+            # Fuera de toda raíz publicada en nginx: servir directamente
+            return None
+        return {"X-Accel-Redirect": quote(location)}
+    return None
+
+
+def serve_file(
+    request: Request,
+    path: str | os.PathLike[str],
+    *,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+    disposition: str = "attachment",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Devuelve una respuesta para servir un archivo ya autorizado.
+
+    Args:
+        request: Petición actual (para cabeceras condicionales y Range)
+        path: Ruta del archivo en disco (debe existir y estar validada)
+        filename: Nombre a mostrar en Content-Disposition (None = sin nombre)
+        media_type: Content-Type; si se omite se infiere de la extensión
+        disposition: "attachment" para descarga, "inline" para previsualizar
+        headers: Cabeceras adicionales (p. ej. Cache-Control)
+
+    Returns:
+        304 si el cliente ya tiene la versión actual, una respuesta vacía con
+        cabecera de descarga delegada si está configurada, o FileResponse.
+    """
+    file_path = Path(path).resolve()
+    stat_result = file_path.stat()
+    etag = build_etag(stat_result)
+
+    if media_type is None:
+        media_type = mimetypes.guess_type(filename or file_path.name)[0] or "application/octet-stream"
+
+    response_headers: Dict[str, str] = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    response_headers.update(headers or {})
+
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=response_headers)
+
+    if filename is not None:
+        response_headers["Content-Disposition"] = _content_disposition(disposition, filename)
+    else:
+        response_headers["Content-Disposition"] = disposition
+
+    offload = _offload_headers(file_path)
+    if offload is not None:
+        response_headers.update(offload)
+        # El proxy sustituye el cuerpo; Content-Type se propaga al cliente
+        return Response(status_code=200, media_type=media_type, headers=response_headers)
+
+    return FileResponse(
+        path=str(file_path),
+        media_type=media_type,
+        headers=response_headers,
+        stat_result=stat_result,
+    )
@@ -0,0 +1,44 @@
+"""
+Paginación por cursor (keyset) sobre (created_at, id) en orden descendente.
+
+En lugar de OFFSET, cada página continúa tras la última fila de la anterior con
+una comparación de filas (created_at, id) < (cursor_created_at, cursor_id), que
+el índice compuesto resuelve sin recorrer las filas previas: la página 500 cuesta
+lo mismo que la primera. El cursor es opaco para el cliente (base64 url-safe).
+"""
+import base64
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi import status as http_status
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) del cursor; 400 si no es válido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_raw, id_raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return datetime.fromisoformat(created_raw), int(id_raw)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación no válido")
+
+
+def after_cursor(created_column: Any, id_column: Any, cursor: str):
+    """Condición para las filas posteriores al cursor en orden (created_at DESC, id DESC)."""
+    created_at, row_id = decode_cursor(cursor)
+    return tuple_(created_column, id_column) < tuple_(created_at, row_id)
+
+
+def set_next_cursor(response: Response, last_created_at: Optional[datetime], last_id: Optional[int]) -> None:
+    """Cabecera con el cursor de la página siguiente (solo si la página salió completa)."""
+    if last_created_at is not None and last_id is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_created_at, last_id)
@@ -0,0 +1,68 @@
+"""
+Caché en memoria con caducidad (TTL), segura entre hilos.
+
+Pensada para respuestas baratas de recalcular pero muy consultadas (contadores,
+estadísticas del dashboard). Es local a cada proceso: con varios workers cada
+uno mantiene su copia y la invalidación explícita solo afecta al proceso que
+hizo el cambio, por lo que el TTL debe ser corto para acotar la desincronización.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Diccionario con caducidad por entrada y tamaño máximo."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict_locked()
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Devuelve el valor en caché o lo calcula con factory() y lo guarda."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """Elimina las entradas cuya clave cumple predicate (todas si es None)."""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def _evict_locked(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._data.items() if expires_at < now]
+        for key in expired:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            # Sin caducadas: descartar la que antes caduca
+            oldest = min(self._data, key=lambda k: self._data[k][0])
+            del self._data[oldest]
@@ -0,0 +1,128 @@
+"""
+Generación de archivos ZIP en streaming.
+
+Construye el ZIP al vuelo sobre un sumidero en memoria que se vacía tras cada
+bloque escrito, de modo que:
+  - No se crean archivos temporales en disco.
+  - La memoria usada está acotada por el tamaño de bloque, no por el total.
+  - El cliente empieza a recibir datos en cuanto se lee el primer archivo.
+
+Los formatos ya comprimidos (PDF, imágenes, documentos Office) se almacenan
+sin recomprimir (ZIP_STORED); el resto se comprime con DEFLATE.
+"""
+import io
+import os
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+from urllib.parse import quote
+
+from fastapi.responses import StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+
+# Extensiones cuyo contenido ya está comprimido: recomprimirlas solo gasta CPU
+STORED_EXTENSIONS = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".zip", ".gz", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Sumidero no posicionable: acumula lo escrito hasta que se recoge."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[Tuple[Path, str]]) -> Iterator[bytes]:
+    """
+    Genera los bytes de un ZIP con los archivos indicados.
+
+    Args:
+        entries: Pares (ruta en disco, nombre dentro del ZIP)
+
+    Yields:
+        Bloques del ZIP a medida que se van produciendo
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", allowZip64=True) as zf:
+        for file_path, arcname in entries:
+            try:
+                stat_result = file_path.stat()
+            except OSError:
+                # El archivo desapareció entre el listado y la lectura
+                continue
+
+            zinfo = zipfile.ZipInfo(arcname, date_time=_zip_date_time(stat_result.st_mtime))
+            zinfo.file_size = stat_result.st_size
+            if file_path.suffix.lower() in STORED_EXTENSIONS:
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+
+            with open(file_path, "rb") as src, zf.open(zinfo, mode="w") as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Directorio central
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def _zip_date_time(mtime: float) -> Tuple[int, int, int, int, int, int]:
+    # El formato ZIP no admite fechas anteriores a 1980
+    moment = datetime.fromtimestamp(max(mtime, 315532800))
+    return (moment.year, moment.month, moment.day, moment.hour, moment.minute, moment.second)
+
+
+def zip_streaming_response(entries: Iterable[Tuple[Path, str]], filename: str) -> StreamingResponse:
+    """Respuesta HTTP que descarga el ZIP generado al vuelo."""
+    quoted = quote(filename)
+    if quoted != filename:
+        disposition = f"attachment; filename*=utf-8''{quoted}"
+    else:
+        disposition = f'attachment; filename="{filename}"'
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": disposition, "Cache-Control": "no-store"},
+    )
+
+
+def iter_folder_files(folder: Path, base: Path) -> Iterator[Tuple[Path, str]]:
+    """Recorre una carpeta recursivamente devolviendo (ruta, nombre relativo a base)."""
+    ignored = {"thumbs.db", "desktop.ini"}
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower() in ignored:
+                continue
+            path = Path(root) / name
+            # No seguir enlaces simbólicos que podrían apuntar fuera de la carpeta
+            if path.is_symlink():
+                continue
+            yield path, path.relative_to(base).as_posix()
@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
 import os
 import sys
 
@@ -10,11 +11,27 @@ BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 
-from app.api import dashboard, traffic, vacations, documents, payroll, profile, settings, users, auth, user_files, documentation, activity, dietas, distancieros, folder_management, trips, resources, truck_inspections
+from app.api import dashboard, traffic, vacations, documents, payroll, profile, settings, users, auth, user_files, documentation, activity, dietas, distancieros, folder_management, trips, resources, truck_inspections, notifications, events
 from app.database.connection import check_database_connection
 from app.middleware.maintenance import MaintenanceMiddleware
-from app.config import settings as app_settings
+from app.config import settings as app_settings, ensure_storage_directories
 from app.services.folder_structure_service import FolderStructureService
+from app.services.event_bus import EventBus
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialización del filesystem al arrancar el servidor (no al importar main)."""
+    try:
+        ensure_storage_directories()
+        FolderStructureService.initialize_system_folders()
+        print("Sistema de carpetas inicializado correctamente")
+    except Exception as e:
+        print(f"Error inicializando sistema de carpetas: {str(e)}")
+    yield
+    # Cerrar los streams SSE abiertos para no bloquear el apagado
+    EventBus.close_all()
+
 
 # Habilitamos documentación para ver y validar seguridad (Bearer OAuth2)
 app = FastAPI(
@@ -22,7 +39,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url=None,       # Swagger UI deshabilitado
     redoc_url=None,      # ReDoc deshabilitado
-    openapi_url=None     # Endpoint OpenAPI deshabilitado
+    openapi_url=None,    # Endpoint OpenAPI deshabilitado
+    lifespan=lifespan
 )
 
 # Agregar middleware de mantenimiento (debe ir antes que CORS)
@@ -35,6 +53,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor de la página siguiente en listados con paginación keyset
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Incluir rutas
@@ -57,13 +77,8 @@ app.include_router(distancieros.router, prefix="/api/distancieros", tags=["dista
 app.include_router(folder_management.router, prefix="/api", tags=["folder-management"])
 app.include_router(resources.router)  # incluye /api/resources/*
 app.include_router(truck_inspections.router, prefix="/api/truck-inspections", tags=["truck-inspections"])
-
-# Inicializar sistema de carpetas al arrancar
-try:
-    FolderStructureService.initialize_system_folders()
-    print("Sistema de carpetas inicializado correctamente")
-except Exception as e:
-    print(f"Error inicializando sistema de carpetas: {str(e)}")
+app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
 
 # Nota: la ruta raíz '/' será servida por el fallback de la SPA si existe el build
 
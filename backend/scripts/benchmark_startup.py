@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Mide el tiempo de arranque en frío del backend con `python -X importtime`.
+
+Importa `main` en un proceso nuevo (varias veces, para descartar ruido de caché),
+muestra los módulos con mayor tiempo acumulado y comprueba que el import no deja
+efectos secundarios en el filesystem (crear carpetas es tarea del lifespan).
+
+Uso (desde backend/):
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --runs 5 --top 25 --max-ms 2500
+    python scripts/benchmark_startup.py --forbid fitz
+
+Devuelve código 1 si la mediana supera --max-ms o si se carga algún módulo de --forbid.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Módulos pesados y opcionales que no deben cargarse al importar la aplicación
+DEFAULT_FORBIDDEN = ["fitz", "PIL"]
+
+
+def run_importtime(env: Dict[str, str]) -> Tuple[int, List[Tuple[int, int, str]]]:
+    """Ejecuta `import main` con -X importtime y devuelve (total_us, filas)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"El import de main falló (código {result.returncode})")
+
+    rows: List[Tuple[int, int, str]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # Formato: "import time:  <propio us> | <acumulado us> | <módulo indentado>"
+        self_part, cumulative_part, name = line.split("|", 2)
+        rows.append((int(self_part.split(":", 1)[1]), int(cumulative_part), name.strip()))
+    total = next((cumulative for _, cumulative, name in rows if name == "main"), 0)
+    return total, rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Número de arranques a medir")
+    parser.add_argument("--top", type=int, default=20, help="Módulos a mostrar por tiempo acumulado")
+    parser.add_argument("--max-ms", type=float, default=None, help="Umbral de la mediana en milisegundos")
+    parser.add_argument("--forbid", action="append", default=None, help="Módulo que no debe importarse (repetible)")
+    args = parser.parse_args()
+
+    forbidden = args.forbid if args.forbid is not None else DEFAULT_FORBIDDEN
+
+    # Rutas de archivos en un directorio temporal vacío para detectar escrituras al importar
+    sandbox = tempfile.mkdtemp(prefix="sgt-startup-")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(sandbox, "bench.db"))
+    for var, sub in (
+        ("FILES_BASE_PATH", "files"),
+        ("USER_FILES_BASE_PATH", "files/users"),
+        ("TRAFFIC_FILES_BASE_PATH", "files/traffic"),
+        ("THUMBNAILS_CACHE_PATH", "files/cache/thumbnails"),
+    ):
+        env[var] = os.path.join(sandbox, sub)
+
+    totals: List[int] = []
+    rows: List[Tuple[int, int, str]] = []
+    for _ in range(max(1, args.runs)):
+        total, rows = run_importtime(env)
+        totals.append(total)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"Arranques medidos: {len(totals)}")
+    print(f"import main: mediana {median_ms:.1f} ms (min {min(totals) / 1000:.1f} ms, max {max(totals) / 1000:.1f} ms)")
+    print()
+    print(f"{'acumulado ms':>13} {'propio ms':>10}  módulo")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"{cumulative_us / 1000:13.1f} {self_us / 1000:10.1f}  {name}")
+
+    failed = False
+    loaded = {name for _, _, name in rows}
+    for module in forbidden:
+        if module in loaded:
+            print(f"\nERROR: el módulo opcional '{module}' se importa al arrancar (debe ser perezoso)")
+            failed = True
+
+    created = [entry for entry in os.listdir(sandbox) if entry != "bench.db"]
+    shutil.rmtree(sandbox, ignore_errors=True)
+    if created:
+        print(f"\nERROR: importar main crea archivos o carpetas: {created}")
+        failed = True
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"\nERROR: la mediana ({median_ms:.1f} ms) supera el umbral de {args.max_ms:.1f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Comprueba con EXPLAIN que los filtros por año de vacaciones usan los índices
+compuestos de la migración b7e21c4d9a10 en PostgreSQL.
+
+Requiere una base de datos PostgreSQL migrada (alembic upgrade head) en
+DATABASE_URL; con cualquier otro motor el módulo se omite. No modifica datos:
+cada consulta se explica dentro de una transacción que se deshace.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL.startswith("postgresql"),
+    reason="Requiere DATABASE_URL de PostgreSQL",
+)
+
+COMPANY_STATUS_START_INDEX = "idx_vacation_requests_company_status_start"
+USER_START_INDEX = "idx_vacation_requests_user_start"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(DATABASE_URL)
+    yield engine
+    engine.dispose()
+
+
+def _explain(engine, statement) -> str:
+    """Plan de la consulta con los escaneos secuenciales desactivados.
+
+    Con una tabla pequeña (o vacía) el planificador prefiere el escaneo
+    secuencial aunque exista el índice; desactivarlo hace que el plan muestre
+    qué índice se usaría con volumen real.
+    """
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            plan = "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+            transaction.rollback()
+    return plan
+
+
+def test_composite_indexes_exist(engine):
+    with engine.connect() as conn:
+        names = set(
+            conn.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = 'vacation_requests'")
+            ).scalars()
+        )
+    assert {COMPANY_STATUS_START_INDEX, USER_START_INDEX} <= names, (
+        "Faltan los índices de la migración b7e21c4d9a10: ejecute alembic upgrade head"
+    )
+
+
+def test_company_status_year_uses_composite_index(engine):
+    from app.api.vacations import _year_range_filter
+    from app.models.company_enum import Company
+    from app.models.vacation import VacationRequest, VacationStatus
+
+    statement = select(VacationRequest.id).where(
+        VacationRequest.company == Company.SERVIGLOBAL,
+        VacationRequest.status == VacationStatus.PENDING,
+        *_year_range_filter(2025),
+    )
+    plan = _explain(engine, statement)
+    assert COMPANY_STATUS_START_INDEX in plan, plan
+
+
+def test_user_year_uses_user_start_index(engine):
+    from app.api.vacations import _year_range_filter
+    from app.models.vacation import VacationRequest
+
+    statement = select(VacationRequest.id).where(
+        VacationRequest.user_id == 1,
+        *_year_range_filter(2025),
+    )
+    plan = _explain(engine, statement)
+    assert USER_START_INDEX in plan, plan
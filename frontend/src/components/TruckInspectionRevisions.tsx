@@ -111,6 +111,69 @@ type UserOption = {
 };
 
 
+interface InspectionImageThumbnailProps {
+  imagePath: string;
+  alt: string;
+  onOpen: () => void;
+}
+
+// Miniatura autenticada de la foto de un componente (size=thumb); la imagen completa solo se pide al abrir la vista previa
+const InspectionImageThumbnail: React.FC<InspectionImageThumbnailProps> = ({ imagePath, alt, onOpen }) => {
+  const [thumbUrl, setThumbUrl] = useState<string | null>(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    let cancelled = false;
+    let objectUrl: string | null = null;
+    setThumbUrl(null);
+    setFailed(false);
+    truckInspectionService
+      .getImageWithAuth(imagePath, 'thumb')
+      .then((url) => {
+        objectUrl = url;
+        if (cancelled) {
+          URL.revokeObjectURL(url);
+        } else {
+          setThumbUrl(url);
+        }
+      })
+      .catch(() => {
+        if (!cancelled) setFailed(true);
+      });
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [imagePath]);
+
+  if (failed) return null;
+
+  return (
+    <Box
+      onClick={onOpen}
+      sx={{
+        width: 120,
+        height: 90,
+        mb: 1,
+        borderRadius: '8px',
+        border: '1px solid #e9ecef',
+        overflow: 'hidden',
+        cursor: 'pointer',
+        display: 'flex',
+        alignItems: 'center',
+        justifyContent: 'center',
+        backgroundColor: 'white',
+      }}
+    >
+      {thumbUrl ? (
+        <Box component="img" src={thumbUrl} alt={alt} sx={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+      ) : (
+        <CircularProgress size={20} />
+      )}
+    </Box>
+  );
+};
+
 interface InspectionDetailModalProps {
   open: boolean;
   inspection: TruckInspectionSummary | null;
@@ -220,7 +283,8 @@ const InspectionDetailModal: React.FC<InspectionDetailModalProps> = ({ open, ins
 
   const handleImagePreviewWithAuth = async (imagePath: string, title: string) => {
     try {
-      const blobUrl = await truckInspectionService.getImageWithAuth(imagePath);
+      // La vista previa es el único sitio que pide la imagen completa
+      const blobUrl = await truckInspectionService.getImageWithAuth(imagePath, 'full');
       setImagePreview({
         open: true,
         url: blobUrl,
@@ -481,6 +545,14 @@ const InspectionDetailModal: React.FC<InspectionDetailModalProps> = ({ open, ins
                                 <Typography variant="body2" color="text.secondary" sx={{ mb: 1 }}>
                                   Imagen:
                                 </Typography>
+                                <InspectionImageThumbnail
+                                  imagePath={component.imagePath}
+                                  alt={component.label}
+                                  onOpen={() => component.imagePath && handleImagePreviewWithAuth(
+                                    component.imagePath,
+                                    `${component.label} - ${inspection?.truck_license_plate}`
+                                  )}
+                                />
                                 <Button
                                   variant="outlined"
                                   startIcon={<Visibility />}
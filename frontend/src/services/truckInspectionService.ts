@@ -389,8 +389,9 @@ class TruckInspectionService {
 
   /**
    * Obtiene la URL completa para mostrar una imagen de inspección
+   * (size 'thumb' devuelve la miniatura, para listados y previsualizaciones)
    */
-  getImageUrl(imagePath: string): string {
+  getImageUrl(imagePath: string, size: 'full' | 'thumb' = 'full'): string {
     if (!imagePath) return '';
     
     // Si es una ruta absoluta, la devolvemos tal como está
@@ -412,15 +413,16 @@ class TruckInspectionService {
       : cleanPath;
 
     // Construir la URL completa sin token (se enviará en header)
-    return `${API_BASE_URL}/image/${relativePath}`;
+    const query = size === 'thumb' ? '?size=thumb' : '';
+    return `${API_BASE_URL}/image/${relativePath}${query}`;
   }
 
   /**
    * Obtiene una imagen con autenticación mediante fetch
    */
-  async getImageWithAuth(imagePath: string): Promise<string> {
+  async getImageWithAuth(imagePath: string, size: 'full' | 'thumb' = 'full'): Promise<string> {
     const token = localStorage.getItem('access_token');
-    const imageUrl = this.getImageUrl(imagePath);
+    const imageUrl = this.getImageUrl(imagePath, size);
     
     try {
       const response = await fetch(imageUrl, {